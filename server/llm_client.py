@@ -2,23 +2,177 @@
 Gemini LLM client for NPC dialogue generation.
 Implements structured JSON output with streaming support.
 """
+import functools
+import hashlib
 import json
 import logging
-from typing import AsyncGenerator, Dict, Any, List
+from typing import AsyncGenerator, Dict, Any, List, Optional, Tuple
+import httpx
+from cachetools import TTLCache
 from google import genai
 from google.genai import types
+from pydantic import ValidationError
 
 from .schemas import (
+    NPC_DIALOGUE_ADAPTER,
     NPC_DIALOGUE_SCHEMA,
     SYSTEM_INSTRUCTION,
     ChatTurnRequest,
+    GameContext,
     NpcDialogueResponse,
-    MemoryEntry
+    MemoryEntry,
+    Persona
 )
 from .settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Built once at import and shared by every generate_* method: the schema and
+# settings never change at runtime, so there is no reason to re-walk
+# NPC_DIALOGUE_SCHEMA on every call. Rebuild it if per-request sampling
+# overrides are ever added.
+_GEN_CONFIG = types.GenerateContentConfig(
+    system_instruction=SYSTEM_INSTRUCTION,
+    response_mime_type="application/json",
+    response_schema=NPC_DIALOGUE_SCHEMA,  # Enforce schema
+    temperature=settings.temperature,
+    top_p=settings.top_p,
+    max_output_tokens=settings.max_output_tokens
+)
+
+_EMPTY_MEMORY_SECTION = "- (No prior memories)"
+
+# Validated final JSON keyed by a hash of the full prompt. Sampled output is
+# not reproducible, so the cache is only enabled for deterministic decoding.
+_RESPONSE_CACHE: Optional[TTLCache] = (
+    TTLCache(maxsize=settings.response_cache_size, ttl=settings.response_cache_ttl)
+    if settings.temperature == 0 else None
+)
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Per-turn part of the prompt; the persona block is cached separately, so only
+# this template is formatted on every turn
+_DYNAMIC_TEMPLATE = """[CONTEXT]
+scene={scene}  time_of_day={time_of_day}  weather={weather}
+last_player_action={last_player_action}
+player_reputation={player_reputation} (-10..+20)
+npc_health={npc_health}  npc_alertness={npc_alertness}
+
+[RETRIEVED_MEMORY]
+{memory_section}
+
+[PLAYER_TEXT]
+"{player_text}"
+"""
+
+
+def _prompt_key(turn_content: str) -> bytes:
+    """
+    Stable cache key for a fully built prompt.
+    
+    The prompt already encodes persona, context, memories, and player text,
+    so hashing it covers every input that affects the response.
+    
+    Args:
+        turn_content: Output of GeminiClient._build_turn_content
+    
+    Returns:
+        16-byte blake2b digest
+    """
+    return hashlib.blake2b(turn_content.encode("utf-8"), digest_size=16).digest()
+
+
+def response_cache_stats() -> Dict[str, Any]:
+    """
+    Report response cache hit/miss counters.
+    
+    Returns:
+        Dict with enabled flag, hits, misses, and current size
+    """
+    return {
+        "enabled": _RESPONSE_CACHE is not None,
+        "hits": _cache_stats["hits"],
+        "misses": _cache_stats["misses"],
+        "size": len(_RESPONSE_CACHE) if _RESPONSE_CACHE is not None else 0,
+    }
+
+
+def _persona_prefix(persona: Persona) -> str:
+    """
+    Format the static [PERSONA] block that opens every turn for an NPC.
+    
+    Args:
+        persona: The NPC persona
+    
+    Returns:
+        Persona section, identical across turns for the same persona
+    """
+    return _format_persona(
+        persona.name,
+        persona.role,
+        tuple(persona.values),
+        tuple(persona.quirks),
+        tuple(persona.backstory)
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _format_persona(
+    name: str,
+    role: str,
+    values: Tuple[str, ...],
+    quirks: Tuple[str, ...],
+    backstory: Tuple[str, ...]
+) -> str:
+    """Cached worker for _persona_prefix; one entry per distinct persona."""
+    return f"""[PERSONA]
+Name: {name}
+Role: {role}
+Values: {", ".join(values)}
+Quirks: {", ".join(quirks)}
+Backstory hooks: {"; ".join(backstory)}
+
+"""
+
+
+def _memory_line(mem: MemoryEntry) -> str:
+    """Format one memory for the [RETRIEVED_MEMORY] prompt section."""
+    return f"- (salience {mem.salience}) {mem.text}"
+
+
+def _dynamic_suffix(
+    ctx: GameContext,
+    memories: List[MemoryEntry],
+    player_text: str
+) -> str:
+    """
+    Format the per-turn part of the prompt: context, memories, and player text.
+    
+    Args:
+        ctx: Current game context
+        memories: Retrieved memories for context
+        player_text: What the player said
+    
+    Returns:
+        Context, memory, and player sections
+    """
+    # Build memory section
+    memory_section = "\n".join(
+        _memory_line(mem) for mem in memories
+    ) or _EMPTY_MEMORY_SECTION
+    
+    return _DYNAMIC_TEMPLATE.format_map({
+        "scene": ctx.scene,
+        "time_of_day": ctx.time_of_day,
+        "weather": ctx.weather,
+        "last_player_action": ctx.last_player_action or "none",
+        "player_reputation": ctx.player_reputation,
+        "npc_health": ctx.npc_health,
+        "npc_alertness": ctx.npc_alertness,
+        "memory_section": memory_section,
+        "player_text": player_text,
+    })
+
 
 class GeminiClient:
     """
@@ -31,10 +185,28 @@ class GeminiClient:
         if not settings.gemini_api_key:
             raise ValueError("GEMINI_API_KEY not configured")
         
-        self.client = genai.Client(api_key=settings.gemini_api_key)
+        # One long-lived HTTP/2 connection pool for every turn, so requests
+        # ride a warm connection instead of paying a TLS handshake each time
+        self.client = genai.Client(
+            api_key=settings.gemini_api_key,
+            http_options=types.HttpOptions(
+                timeout=30_000,  # milliseconds
+                async_client_args={
+                    "http2": True,
+                    "limits": httpx.Limits(
+                        max_keepalive_connections=32,
+                        max_connections=64
+                    ),
+                },
+            ),
+        )
         self.model = settings.gemini_model
         logger.info(f"GeminiClient initialized with model: {self.model}")
     
+    async def aclose(self):
+        """Close the pooled async HTTP connections."""
+        await self.client.aio.aclose()
+    
     def _build_turn_content(
         self,
         payload: ChatTurnRequest,
@@ -43,6 +215,10 @@ class GeminiClient:
         """
         Build the user content string from persona, context, memories, and player input.
         
+        The persona block comes first so the prompt has a byte-identical prefix
+        across turns with the same NPC, which lets Gemini's implicit prompt
+        caching kick in. Everything that changes per turn goes after it.
+        
         Args:
             payload: The chat turn request from Unity
             memories: Retrieved memories for context
@@ -50,43 +226,9 @@ class GeminiClient:
         Returns:
             Formatted prompt string
         """
-        persona = payload.persona
-        ctx = payload.context
-        
-        # Build memory section
-        memory_lines = []
-        for mem in memories:
-            memory_lines.append(f"- (salience {mem.salience}) {mem.text}")
-        memory_section = "\n".join(memory_lines) if memory_lines else "- (No prior memories)"
-        
-        # Format the turn using the template
-        content = f"""[PERSONA]
-Name: {persona.name}
-Role: {persona.role}
-Values: {", ".join(persona.values)}
-Quirks: {", ".join(persona.quirks)}
-Backstory hooks: {"; ".join(persona.backstory)}
-
-[CONTEXT]
-scene={ctx.scene}  time_of_day={ctx.time_of_day}  weather={ctx.weather}
-last_player_action={ctx.last_player_action or "none"}
-player_reputation={ctx.player_reputation} (-10..+20)
-npc_health={ctx.npc_health}  npc_alertness={ctx.npc_alertness}
-
-[RETRIEVED_MEMORY]
-{memory_section}
-
-[PLAYER_TEXT]
-"{payload.player_text}"
-
-[STYLE & ACTION HINTS]
-- Choose a fitting emotion that matches the subtext.
-- If reputation < 0: guarded/hostile tone; if > 10: warm/helpful tone.
-- Map severe wrongdoing to 'call_guard' or 'step_back'; kindness to 'open_shop' or 'give_item'.
-- Write at most 1 memory_writes entry if something notable happened.
-- voice_hint: choose calm, context-appropriate voice unless situation suggests otherwise.
-"""
-        return content
+        return _persona_prefix(payload.persona) + _dynamic_suffix(
+            payload.context, memories, payload.player_text
+        )
     
     async def generate_npc_response_stream(
         self,
@@ -112,78 +254,84 @@ npc_health={ctx.npc_health}  npc_alertness={ctx.npc_alertness}
             # Build the turn content
             turn_content = self._build_turn_content(payload, memories)
             
-            # Configure generation with structured output
-            config = types.GenerateContentConfig(
-                system_instruction=SYSTEM_INSTRUCTION,
-                response_mime_type="application/json",
-                response_schema=NPC_DIALOGUE_SCHEMA,  # Enforce schema
-                temperature=settings.temperature,
-                top_p=settings.top_p,
-                max_output_tokens=settings.max_output_tokens
-            )
-            
-            logger.info(f"Generating response for npc={payload.npc_id}, player={payload.player_id}")
+            # Identical prompt under deterministic decoding: skip Gemini
+            cache_key = None
+            if _RESPONSE_CACHE is not None:
+                cache_key = _prompt_key(turn_content)
+                cached_json = _RESPONSE_CACHE.get(cache_key)
+                if cached_json is not None:
+                    _cache_stats["hits"] += 1
+                    yield {"type": "final", "json": cached_json}
+                    return
+                _cache_stats["misses"] += 1
             
-            # Stream the response
-            accumulated_text = ""
+            logger.debug(
+                "Generating response for npc=%s, player=%s",
+                payload.npc_id, payload.player_id
+            )
             
-            response = self.client.models.generate_content(
+            # Stream the response, forwarding each delta as the model emits it.
+            # Deltas are collected in a list and joined once at the end rather
+            # than re-building the accumulated string on every chunk.
+            parts: List[str] = []
+
+            stream = await self.client.aio.models.generate_content_stream(
                 model=self.model,
                 contents=turn_content,
-                config=config
+                config=_GEN_CONFIG
             )
-            
-            # For non-streaming, we get the full text at once
-            # Since Gemini structured output doesn't support true streaming yet,
-            # we'll simulate it by yielding chunks
-            full_text = response.text
-            accumulated_text = full_text
-            
-            # Yield the complete response as tokens (chunked for streaming effect)
-            chunk_size = 20
-            for i in range(0, len(full_text), chunk_size):
-                chunk = full_text[i:i + chunk_size]
-                yield {"type": "token", "text": chunk}
-            
+
+            async for chunk in stream:
+                text = chunk.text
+                if not text:
+                    continue
+                parts.append(text)
+                yield {"type": "token", "text": text}
+
+            accumulated_text = "".join(parts)
+
             # Validate the final JSON
             try:
-                parsed_json = json.loads(accumulated_text)
-                validated_response = NpcDialogueResponse(**parsed_json)
+                validated_response = NPC_DIALOGUE_ADAPTER.validate_json(accumulated_text)
+                
+                final_json = validated_response.model_dump_json()
+                if cache_key is not None:
+                    # Cached without memory_writes: a replayed turn must not
+                    # store the same memory again
+                    _RESPONSE_CACHE[cache_key] = validated_response.model_copy(
+                        update={"memory_writes": None}
+                    ).model_dump_json()
                 
                 # Yield the final validated JSON
                 yield {
                     "type": "final",
-                    "json": validated_response.model_dump_json()
+                    "json": final_json
                 }
                 
                 logger.info(
-                    f"Response generated: emotion={validated_response.emotion}, "
-                    f"behavior={validated_response.behavior_directive}, "
-                    f"utterance_len={len(validated_response.utterance)}"
+                    "Response generated: emotion=%s, behavior=%s, utterance_len=%d",
+                    validated_response.emotion,
+                    validated_response.behavior_directive,
+                    len(validated_response.utterance)
                 )
                 
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON from model: {e}")
+            except ValidationError as e:
+                if any(err["type"] == "json_invalid" for err in e.errors()):
+                    logger.error("Invalid JSON from model: %s", e)
+                    utterance = "I... seem to have lost my words."
+                else:
+                    logger.error("Validation error: %s", e)
+                    utterance = "Forgive me, I'm not feeling quite myself."
                 # Fallback response
                 fallback = {
-                    "utterance": "I... seem to have lost my words.",
-                    "emotion": "neutral",
-                    "behavior_directive": "none"
-                }
-                yield {"type": "final", "json": json.dumps(fallback)}
-                
-            except Exception as e:
-                logger.error(f"Validation error: {e}")
-                # Fallback response
-                fallback = {
-                    "utterance": "Forgive me, I'm not feeling quite myself.",
+                    "utterance": utterance,
                     "emotion": "neutral",
                     "behavior_directive": "none"
                 }
                 yield {"type": "final", "json": json.dumps(fallback)}
         
         except Exception as e:
-            logger.error(f"Error generating response: {e}", exc_info=True)
+            logger.error("Error generating response: %s", e, exc_info=True)
             # Yield error as final response
             error_response = {
                 "utterance": "I... I cannot speak right now.",
@@ -191,7 +339,33 @@ npc_health={ctx.npc_health}  npc_alertness={ctx.npc_alertness}
                 "behavior_directive": "none"
             }
             yield {"type": "final", "json": json.dumps(error_response)}
-    
+
+    async def generate_npc_response(
+        self,
+        payload: ChatTurnRequest,
+        memories: List[MemoryEntry]
+    ) -> NpcDialogueResponse:
+        """
+        Non-streaming version for async callers.
+        Uses the async client so the event loop is never blocked on the HTTP call.
+
+        Args:
+            payload: The chat turn request
+            memories: Retrieved memories for context
+
+        Returns:
+            Validated NpcDialogueResponse
+        """
+        turn_content = self._build_turn_content(payload, memories)
+
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=turn_content,
+            config=_GEN_CONFIG
+        )
+
+        return NPC_DIALOGUE_ADAPTER.validate_json(response.text)
+
     def generate_npc_response_sync(
         self,
         payload: ChatTurnRequest,
@@ -199,7 +373,8 @@ npc_health={ctx.npc_health}  npc_alertness={ctx.npc_alertness}
     ) -> NpcDialogueResponse:
         """
         Synchronous version for testing or non-streaming use cases.
-        
+        Blocks the calling thread; from async code use generate_npc_response.
+
         Args:
             payload: The chat turn request
             memories: Retrieved memories for context
@@ -209,30 +384,17 @@ npc_health={ctx.npc_health}  npc_alertness={ctx.npc_alertness}
         """
         turn_content = self._build_turn_content(payload, memories)
         
-        config = types.GenerateContentConfig(
-            system_instruction=SYSTEM_INSTRUCTION,
-            response_mime_type="application/json",
-            response_schema=NPC_DIALOGUE_SCHEMA,
-            temperature=settings.temperature,
-            top_p=settings.top_p,
-            max_output_tokens=settings.max_output_tokens
-        )
-        
         response = self.client.models.generate_content(
             model=self.model,
             contents=turn_content,
-            config=config
+            config=_GEN_CONFIG
         )
         
-        parsed_json = json.loads(response.text)
-        return NpcDialogueResponse(**parsed_json)
-
-
-# Global client instance
-gemini_client = GeminiClient()
+        return NPC_DIALOGUE_ADAPTER.validate_json(response.text)
 
 
 async def generate_npc_json_stream(
+    client: GeminiClient,
     payload: ChatTurnRequest,
     memories: List[MemoryEntry]
 ) -> AsyncGenerator[Dict[str, Any], None]:
@@ -241,12 +403,12 @@ async def generate_npc_json_stream(
     This is what the FastAPI WebSocket endpoint calls.
     
     Args:
+        client: The GeminiClient created in the app lifespan
         payload: The chat turn request from Unity
         memories: Retrieved memories for context
     
     Yields:
         Stream of response chunks
     """
-    async for chunk in gemini_client.generate_npc_response_stream(payload, memories):
+    async for chunk in client.generate_npc_response_stream(payload, memories):
         yield chunk
-
@@ -2,31 +2,49 @@
 RPGAI FastAPI Application
 Main server for Unity NPC dialogue system with Gemini and Google Cloud TTS.
 """
+import asyncio
 import json
 import logging
 import time
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from typing import AsyncGenerator, Dict, Any, List
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, status, UploadFile, File, Form
+import msgpack
+import orjson
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, status, UploadFile, File, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from pathlib import Path
 
 from .schemas import (
     ChatTurnRequest,
     NpcMemoryWrite,
     TTSRequest,
+    TTSStreamRequest,
+    TTSSentencesRequest,
     TTSResponse,
     STTRequest,
     STTResponse,
     MemoryEntry
 )
 from .memory import memory_dao
-from .llm_client import generate_npc_json_stream
-from .tts import synthesize_ssml
-from .stt import transcribe_audio
+from .llm_client import (
+    GeminiClient,
+    generate_npc_json_stream,
+    response_cache_stats
+)
+from .tts import (
+    STREAMING_MEDIA_TYPE,
+    STREAMING_SAMPLE_RATE,
+    close_tts_client,
+    stream_speech,
+    synthesize_sentences_from_response,
+    synthesize_ssml,
+    synthesize_ssml_bytes,
+    warm_up_tts_client
+)
+from .stt import stt_client, transcribe_audio_async
 from .settings import settings
 
 # Configure logging
@@ -49,9 +67,39 @@ async def lifespan(app: FastAPI):
     media_path = Path(settings.media_dir)
     media_path.mkdir(parents=True, exist_ok=True)
     
+    # Create or migrate the memory schema before the first request
+    memory_dao.init_db()
+    
+    # Created here rather than at import so the async HTTP pool belongs to
+    # the running loop and importing the app never needs GEMINI_API_KEY
+    app.state.gemini_client = GeminiClient()
+    
+    # Created here so the queue belongs to the running loop
+    app.state.memory_write_queue = asyncio.Queue()
+    app.state.write_worker = asyncio.create_task(
+        memory_writer_loop(app.state.memory_write_queue)
+    )
+    
+    # Open the TTS channels in the background; startup does not wait on it
+    app.state.tts_warm_up = asyncio.create_task(warm_up_tts_client())
+    
     yield
     
     logger.info("🛑 RPGAI server shutting down...")
+    # Flush queued memory writes before stopping the worker
+    try:
+        await asyncio.wait_for(app.state.memory_write_queue.join(), timeout=5)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Dropping %d queued memory writes on shutdown",
+            app.state.memory_write_queue.qsize()
+        )
+    app.state.write_worker.cancel()
+    app.state.tts_warm_up.cancel()
+    memory_dao.close()
+    await app.state.gemini_client.aclose()
+    await stt_client.aclose()
+    await close_tts_client()
 
 
 # Initialize FastAPI app
@@ -59,7 +107,8 @@ app = FastAPI(
     title="RPGAI - NPC Dialogue Service",
     description="LLM-powered NPC dialogue with memory and TTS for Unity",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware - allow all origins for demo (restrict in production)
@@ -78,9 +127,164 @@ app.mount("/media", StaticFiles(directory=str(media_path)), name="media")
 
 
 # ============================================================================
-# WEBSOCKET: STREAMING CHAT
+# MEMORY WRITE QUEUE
 # ============================================================================
 
+# app.state.memory_write_queue (created in lifespan) carries
+# (npc_id, player_id, memory_writes) from finished turns to a single
+# background worker so disk I/O never runs on a connection's task.
+
+# How long the worker waits after the first queued item to batch up others
+WRITE_DEBOUNCE_S = 0.05
+
+
+async def memory_writer_loop(queue: asyncio.Queue) -> None:
+    """
+    Persist queued memory_writes in batches.
+    
+    After the first item arrives, waits WRITE_DEBOUNCE_S and drains whatever
+    else has queued up, then persists the whole batch in one transaction.
+    Invalid entries are skipped; if the batch insert fails, each turn is
+    retried on its own so one bad turn cannot lose the others.
+    
+    Args:
+        queue: Queue of (npc_id, player_id, memory_writes) tuples
+    """
+    while True:
+        items = [await queue.get()]
+        await asyncio.sleep(WRITE_DEBOUNCE_S)
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        
+        try:
+            turns = [
+                _validate_memory_writes(npc_id, player_id, writes)
+                for npc_id, player_id, writes in items
+            ]
+            try:
+                written = await memory_dao.write_many_from_models_async(
+                    [m for turn in turns for m in turn]
+                )
+            except Exception as e:
+                logger.warning(
+                    "Batch memory write failed, retrying per turn: %s", e
+                )
+                written = 0
+                for turn in turns:
+                    try:
+                        written += await memory_dao.write_many_from_models_async(turn)
+                    except Exception as e:
+                        logger.error("Error writing memories for turn: %s", e)
+            logger.info(
+                "Auto-wrote %d memories from %d turns", written, len(items)
+            )
+        except Exception as e:
+            logger.error("Error writing queued memories: %s", e)
+        finally:
+            for _ in items:
+                queue.task_done()
+
+
+def _validate_memory_writes(
+    npc_id: str,
+    player_id: str,
+    writes: List[Dict[str, Any]]
+) -> List[NpcMemoryWrite]:
+    """
+    Convert one turn's memory_writes to models, skipping invalid entries.
+    
+    Args:
+        npc_id: NPC the turn belongs to
+        player_id: Player the turn belongs to
+        writes: memory_writes dicts as produced by the model
+    
+    Returns:
+        NpcMemoryWrite instances for the entries that validated
+    """
+    memories = []
+    for write in writes:
+        try:
+            memories.append(
+                NpcMemoryWrite(npc_id=npc_id, player_id=player_id, **write)
+            )
+        except (TypeError, ValueError) as e:
+            logger.warning(
+                "Skipping invalid memory_write: npc=%s, player=%s: %s",
+                npc_id, player_id, e
+            )
+    return memories
+
+
+# ============================================================================
+# STREAMING CHAT
+# ============================================================================
+
+async def _run_turn(
+    payload: ChatTurnRequest,
+    start_time: float
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Run one dialogue turn and yield the messages to send to the client.
+    Shared by the WebSocket and SSE endpoints.
+    
+    Retrieves memories, streams the model output, and queues any
+    memory_writes the model produced for the background writer.
+    
+    Args:
+        payload: The validated chat turn request
+        start_time: When the request was received, for the elapsed log
+    
+    Yields:
+        {"type": "token", ...} messages followed by one {"type": "final", ...}
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Received chat turn: npc=%s, player=%s, text='%s...'",
+            payload.npc_id, payload.player_id, payload.player_text[:50]
+        )
+    
+    # Retrieve relevant memories (top 3 by salience & recency)
+    memories = await memory_dao.top_async(
+        npc_id=payload.npc_id,
+        player_id=payload.player_id,
+        k=3,
+        min_salience=0
+    )
+    logger.debug("Retrieved %d memories", len(memories))
+    
+    # Stream the response. memory_writes are taken from the validated final
+    # JSON and handed to the background writer, which persists them off
+    # this task.
+    token_count = 0
+    async for chunk in generate_npc_json_stream(
+        app.state.gemini_client, payload, memories
+    ):
+        yield chunk
+        
+        if chunk["type"] == "token":
+            token_count += 1
+        elif chunk["type"] == "final":
+            try:
+                # Parse the final JSON to extract memory_writes
+                final_response = json.loads(chunk["json"])
+                
+                # Auto-write memories if the model generated any
+                if final_response.get("memory_writes"):
+                    app.state.memory_write_queue.put_nowait((
+                        payload.npc_id,
+                        payload.player_id,
+                        final_response["memory_writes"]
+                    ))
+            except Exception as e:
+                logger.error("Error processing memory_writes: %s", e)
+    
+    elapsed = time.time() - start_time
+    logger.info(
+        "Turn completed: %d tokens streamed, elapsed=%.2fs",
+        token_count, elapsed
+    )
+
+
 @app.websocket("/v1/chat.stream")
 async def chat_stream(websocket: WebSocket):
     """
@@ -92,70 +296,37 @@ async def chat_stream(websocket: WebSocket):
     3. Server streams tokens: {"type":"token", "text":"..."}
     4. Server sends final: {"type":"final", "json":"{...}"}
     
+    Server messages are UTF-8 JSON sent as binary frames (orjson-encoded).
+    A client that offers the "msgpack" subprotocol sends its payload and
+    receives every message as msgpack instead.
+    
     The final JSON is a validated NpcDialogueResponse.
     """
-    await websocket.accept()
+    use_msgpack = "msgpack" in websocket.scope.get("subprotocols", ())
+    await websocket.accept(subprotocol="msgpack" if use_msgpack else None)
+    encode = msgpack.packb if use_msgpack else orjson.dumps
     logger.info("WebSocket connection established")
     
     try:
         # Receive the turn payload
         start_time = time.time()
-        data = await websocket.receive_json()
         
         try:
-            payload = ChatTurnRequest(**data)
-        except Exception as e:
+            if use_msgpack:
+                raw = await websocket.receive_bytes()
+                payload = ChatTurnRequest.model_validate(msgpack.unpackb(raw))
+            else:
+                # Parse and validate straight from the raw text in one pass
+                raw = await websocket.receive_text()
+                payload = ChatTurnRequest.model_validate_json(raw)
+        except ValueError as e:  # ValidationError or a malformed msgpack frame
             error_msg = {"type": "error", "message": f"Invalid payload: {str(e)}"}
-            await websocket.send_json(error_msg)
+            await websocket.send_bytes(encode(error_msg))
             await websocket.close()
             return
         
-        logger.info(
-            f"Received chat turn: npc={payload.npc_id}, "
-            f"player={payload.player_id}, text='{payload.player_text[:50]}...'"
-        )
-        
-        # Retrieve relevant memories (top 3 by salience & recency)
-        memories = memory_dao.top(
-            npc_id=payload.npc_id,
-            player_id=payload.player_id,
-            k=3,
-            min_salience=0
-        )
-        logger.info(f"Retrieved {len(memories)} memories")
-        
-        # Stream the response
-        token_count = 0
-        async for chunk in generate_npc_json_stream(payload, memories):
-            await websocket.send_json(chunk)
-            
-            if chunk["type"] == "token":
-                token_count += 1
-            elif chunk["type"] == "final":
-                # Parse the final JSON to extract memory_writes
-                try:
-                    final_response = json.loads(chunk["json"])
-                    
-                    # Auto-write memories if the model generated any
-                    if "memory_writes" in final_response and final_response["memory_writes"]:
-                        for mem_write in final_response["memory_writes"]:
-                            memory_dao.write(
-                                npc_id=payload.npc_id,
-                                player_id=payload.player_id,
-                                text=mem_write["text"],
-                                salience=mem_write["salience"],
-                                private=mem_write.get("private", True),
-                                keys=mem_write.get("keys", None)
-                            )
-                        logger.info(f"Auto-wrote {len(final_response['memory_writes'])} memories")
-                except Exception as e:
-                    logger.error(f"Error processing memory_writes: {e}")
-        
-        elapsed = time.time() - start_time
-        logger.info(
-            f"Turn completed: {token_count} tokens streamed, "
-            f"elapsed={elapsed:.2f}s"
-        )
+        async for chunk in _run_turn(payload, start_time):
+            await websocket.send_bytes(encode(chunk))
     
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected by client")
@@ -163,7 +334,7 @@ async def chat_stream(websocket: WebSocket):
         logger.error(f"WebSocket error: {e}", exc_info=True)
         try:
             error_msg = {"type": "error", "message": str(e)}
-            await websocket.send_json(error_msg)
+            await websocket.send_bytes(encode(error_msg))
         except:
             pass
     finally:
@@ -173,6 +344,38 @@ async def chat_stream(websocket: WebSocket):
             pass
 
 
+@app.post("/v1/chat.stream.sse")
+async def chat_stream_sse(payload: ChatTurnRequest) -> StreamingResponse:
+    """
+    Server-Sent Events variant of /v1/chat.stream.
+    
+    For clients that send one payload and only read the stream; no WebSocket
+    upgrade or per-frame masking, and it shares the HTTP connection pool.
+    Keep using the WebSocket endpoint when mid-stream interruption is needed.
+    
+    Request body: a ChatTurnRequest
+    
+    Each event is `data: {...}\\n\\n` carrying the same token/final/error
+    messages as the WebSocket endpoint.
+    """
+    start_time = time.time()
+    
+    async def event_stream():
+        try:
+            async for chunk in _run_turn(payload, start_time):
+                yield b"data: " + orjson.dumps(chunk) + b"\n\n"
+        except Exception as e:
+            logger.error(f"SSE stream error: {e}", exc_info=True)
+            error_msg = {"type": "error", "message": str(e)}
+            yield b"data: " + orjson.dumps(error_msg) + b"\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ============================================================================
 # HTTP: MEMORY MANAGEMENT
 # ============================================================================
@@ -193,7 +396,7 @@ async def write_memory(memory: NpcMemoryWrite) -> Dict[str, Any]:
     }
     """
     try:
-        row_id = memory_dao.write_from_model(memory)
+        row_id = await memory_dao.write_from_model_async(memory)
         logger.info(f"Memory written: id={row_id}, npc={memory.npc_id}")
         return {"ok": True, "id": row_id}
     except Exception as e:
@@ -228,14 +431,14 @@ async def get_top_memories(
                 "text": "Player returned lost ring",
                 "salience": 2,
                 "private": true,
-                "keys": "[\"ring\", \"kind_deed\"]",
+                "keys": "ring\tkind_deed",
                 "ts": 1699564800
             }
         ]
     }
     """
     try:
-        memories = memory_dao.top(npc_id, player_id, k)
+        memories = await memory_dao.top_async(npc_id, player_id, k)
         return {
             "memories": [mem.model_dump() for mem in memories]
         }
@@ -258,7 +461,7 @@ async def get_all_npc_memories(
     Useful for debugging or admin panels.
     """
     try:
-        memories = memory_dao.get_all_for_npc(npc_id, player_id, limit)
+        memories = await memory_dao.get_all_for_npc_async(npc_id, player_id, limit)
         return {
             "npc_id": npc_id,
             "count": len(memories),
@@ -277,7 +480,10 @@ async def get_all_npc_memories(
 # ============================================================================
 
 @app.post("/v1/voice/tts")
-async def text_to_speech(request: TTSRequest) -> TTSResponse:
+async def text_to_speech(
+    request: TTSRequest,
+    accept: str = Header(default="")
+) -> TTSResponse:
     """
     Synthesize SSML to audio using Google Cloud TTS.
     
@@ -291,9 +497,22 @@ async def text_to_speech(request: TTSRequest) -> TTSResponse:
     {
         "audio_url": "http://localhost:8000/media/abc123.mp3"
     }
+    
+    Clients sending `Accept: audio/mpeg` get the MP3 bytes in the response
+    body instead, saving the follow-up download; Unity's asset loader keeps
+    using the URL.
     """
     try:
-        audio_url = synthesize_ssml(request.ssml, request.voice_name)
+        if "audio/mpeg" in accept:
+            audio = await synthesize_ssml_bytes(request.ssml, request.voice_name)
+            if not audio:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="TTS synthesis failed"
+                )
+            return Response(content=audio, media_type="audio/mpeg")
+        
+        audio_url = await synthesize_ssml(request.ssml, request.voice_name)
         
         if not audio_url:
             raise HTTPException(
@@ -314,6 +533,85 @@ async def text_to_speech(request: TTSRequest) -> TTSResponse:
         )
 
 
+@app.post("/v1/voice/tts/stream")
+async def text_to_speech_stream(request: TTSStreamRequest) -> StreamingResponse:
+    """
+    Stream synthesized speech as chunked raw PCM while Google renders it.
+    
+    Request body:
+    {
+        "text": "Greetings, traveler.",
+        "voice_name": "en-US-Journey-F"
+    }
+    
+    Returns:
+        Chunked audio/L16 body (16-bit mono, 24 kHz) for immediate playback
+    """
+    chunks = await stream_speech(request.text, request.voice_name)
+    if chunks is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="TTS synthesis failed"
+        )
+    
+    # Sync generator: Starlette iterates it in a worker thread, so the
+    # blocking gRPC stream never stalls the event loop
+    return StreamingResponse(
+        chunks,
+        media_type=STREAMING_MEDIA_TYPE,
+        headers={"X-Sample-Rate": str(STREAMING_SAMPLE_RATE)}
+    )
+
+
+@app.post("/v1/voice/tts/sentences")
+async def text_to_speech_sentences(request: TTSSentencesRequest) -> StreamingResponse:
+    """
+    Synthesize an utterance per sentence and stream the URLs as SSE.
+    
+    Sentences are rendered concurrently; the client can start playing the
+    first clip while later ones are still synthesizing and enqueue the rest.
+    
+    Request body:
+    {
+        "text": "Greetings, traveler. The road north is closed.",
+        "emotion": "neutral",
+        "voice_preset": "elderly_wise",
+        "ssml_style": "calm"
+    }
+    
+    Events, in sentence order:
+        data: {"type":"audio","index":0,"audio_url":"http://.../abc.mp3"}
+        data: {"type":"done"}
+    A sentence that fails to synthesize yields {"type":"error","index":i,...}.
+    """
+    async def event_stream():
+        index = 0
+        try:
+            async for audio_url in synthesize_sentences_from_response(
+                request.text,
+                request.emotion,
+                request.voice_preset,
+                request.ssml_style
+            ):
+                if audio_url:
+                    event = {"type": "audio", "index": index, "audio_url": audio_url}
+                else:
+                    event = {"type": "error", "index": index, "message": "TTS synthesis failed"}
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+                index += 1
+            yield b'data: {"type":"done"}\n\n'
+        except Exception as e:
+            logger.error(f"TTS sentence stream error: {e}", exc_info=True)
+            error_msg = {"type": "error", "message": str(e)}
+            yield b"data: " + orjson.dumps(error_msg) + b"\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ============================================================================
 # HTTP: SPEECH-TO-TEXT
 # ============================================================================
@@ -356,7 +654,7 @@ async def speech_to_text(
         logger.info(f"Transcribing audio: {audio.filename} ({len(audio_content)} bytes, format: {file_format})")
         
         # Transcribe
-        transcribed_text = transcribe_audio(audio_content, file_format, language_code)
+        transcribed_text = await transcribe_audio_async(audio_content, file_format, language_code)
         
         if not transcribed_text:
             raise HTTPException(
@@ -392,7 +690,8 @@ async def health_check() -> Dict[str, Any]:
         "service": "rpgai",
         "version": "1.0.0",
         "model": settings.gemini_model,
-        "memory_count": memory_dao.count_memories()
+        "memory_count": await memory_dao.count_memories_async(),
+        "response_cache": response_cache_stats()
     }
 
 
@@ -436,6 +735,10 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=True,
-        log_level=settings.log_level.lower()
+        log_level=settings.log_level.lower(),
+        # "auto" picks uvloop/httptools when installed (not on Windows)
+        # and falls back to asyncio/h11 otherwise
+        loop="auto",
+        http="auto"
     )
 
@@ -2,19 +2,180 @@
 SQLite-backed memory system for NPC interactions.
 Implements salience × recency retrieval for contextual dialogue.
 """
-import sqlite3
-import json
+import asyncio
+import threading
 import time
-from typing import List, Optional
-from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
 from pathlib import Path
 import logging
 
+try:
+    # Drop-in sqlite3 built against a current SQLite (newer planner, larger
+    # mmap limit) instead of whatever the OS ships; Linux wheels only
+    import pysqlite3 as sqlite3
+except ImportError:
+    import sqlite3
+
 from .schemas import NpcMemoryWrite, MemoryEntry
 from .settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Stored in PRAGMA user_version once _init_db has brought the schema up to
+# date. Bump it whenever _init_db gains a new migration step.
+SCHEMA_VERSION = 1
+
+# Per-connection settings, applied every time a connection is opened.
+# synchronous=NORMAL is durable under WAL except on power loss.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+    # Serve reads straight from the OS page cache instead of copying pages
+    # into SQLite's heap; 256 MB is far above the expected database size
+    "PRAGMA mmap_size=268435456",
+)
+
+# top() results are reused for back-to-back turns with the same NPC/player.
+# Writes through this DAO invalidate them immediately; the TTL bounds how long
+# a write from another worker process can go unseen.
+TOP_CACHE_TTL_S = 2.0
+TOP_CACHE_MAXSIZE = 1024
+
+# count_memories() results, per NPC and overall. Same invalidation scheme;
+# counts only back admin/health reads, so they can go a little staler.
+COUNT_CACHE_TTL_S = 5.0
+
+# SQL is kept in module constants so every call passes the identical string
+# and hits the connection's compiled statement cache instead of re-parsing
+
+# npc_memory is a WITHOUT ROWID table clustered on (npc_id, player_id, ts, id),
+# so one NPC/player's memories sit together on the same pages
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS npc_memory (
+        npc_id TEXT NOT NULL,
+        player_id TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        salience INTEGER NOT NULL CHECK(salience >= 0 AND salience <= 3),
+        private INTEGER NOT NULL DEFAULT 1,
+        keys TEXT,
+        PRIMARY KEY (npc_id, player_id, ts DESC, id DESC)
+    ) WITHOUT ROWID
+"""
+
+# There is no rowid to autoincrement, so id is MAX(id) + 1 (an index seek on
+# idx_mem_id). It is computed inside the INSERT, under SQLite's write lock,
+# so concurrent worker processes cannot hand out the same id.
+_INSERT_SQL = """
+    INSERT INTO npc_memory (id, npc_id, player_id, text, salience, private, keys, ts)
+    VALUES ((SELECT IFNULL(MAX(id), 0) + 1 FROM npc_memory), ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_RETURNING_SQL = _INSERT_SQL + "RETURNING id"
+
+# id breaks ties so rows written in the same second have a stable order and
+# keyset cursors never skip or repeat a row
+_TOP_SQL = """
+    SELECT id, npc_id, player_id, text, salience, private, keys, ts
+    FROM npc_memory
+    WHERE npc_id = ? AND player_id = ?
+    ORDER BY salience DESC, ts DESC, id DESC
+    LIMIT ?
+"""
+
+# Same as _TOP_SQL with a salience floor; only used when min_salience > 0,
+# since salience can never be below 0 and the default needs no predicate
+_TOP_MIN_SALIENCE_SQL = """
+    SELECT id, npc_id, player_id, text, salience, private, keys, ts
+    FROM npc_memory
+    WHERE npc_id = ? AND player_id = ? AND salience >= ?
+    ORDER BY salience DESC, ts DESC, id DESC
+    LIMIT ?
+"""
+
+# Keyset pagination: the row-value comparison resumes with a single index
+# seek after the last row of the previous page instead of using OFFSET
+_TOP_AFTER_SQL = """
+    SELECT id, npc_id, player_id, text, salience, private, keys, ts
+    FROM npc_memory
+    WHERE npc_id = ? AND player_id = ? AND salience >= ?
+      AND (salience, ts, id) < (?, ?, ?)
+    ORDER BY salience DESC, ts DESC, id DESC
+    LIMIT ?
+"""
+
+_ALL_FOR_PLAYER_SQL = """
+    SELECT id, npc_id, player_id, text, salience, private, keys, ts
+    FROM npc_memory
+    WHERE npc_id = ? AND player_id = ?
+    ORDER BY ts DESC, id DESC
+    LIMIT ?
+"""
+
+_ALL_FOR_PLAYER_AFTER_SQL = """
+    SELECT id, npc_id, player_id, text, salience, private, keys, ts
+    FROM npc_memory
+    WHERE npc_id = ? AND player_id = ? AND (ts, id) < (?, ?)
+    ORDER BY ts DESC, id DESC
+    LIMIT ?
+"""
+
+_ALL_FOR_NPC_SQL = """
+    SELECT id, npc_id, player_id, text, salience, private, keys, ts
+    FROM npc_memory
+    WHERE npc_id = ?
+    ORDER BY ts DESC, id DESC
+    LIMIT ?
+"""
+
+_ALL_FOR_NPC_AFTER_SQL = """
+    SELECT id, npc_id, player_id, text, salience, private, keys, ts
+    FROM npc_memory
+    WHERE npc_id = ? AND (ts, id) < (?, ?)
+    ORDER BY ts DESC, id DESC
+    LIMIT ?
+"""
+
+_DELETE_OLD_SQL = "DELETE FROM npc_memory WHERE ts < ?"
+
+# Max free pages released per delete_old_memories sweep
+_VACUUM_PAGES = 1000
+
+_COUNT_SQL = "SELECT COUNT(*) as count FROM npc_memory"
+
+_COUNT_FOR_NPC_SQL = "SELECT COUNT(*) as count FROM npc_memory WHERE npc_id = ?"
+
+
+def _entry_from_row(row: tuple) -> MemoryEntry:
+    """
+    Build a MemoryEntry from a SELECT id, npc_id, player_id, text, salience,
+    private, keys, ts row.
+    
+    Rows come from our own schema, so validation is skipped with
+    model_construct and columns are read by position.
+    
+    Args:
+        row: Plain sqlite3 result tuple
+    
+    Returns:
+        MemoryEntry for the row
+    """
+    return MemoryEntry.model_construct(
+        id=row[0],
+        npc_id=row[1],
+        player_id=row[2],
+        text=row[3],
+        salience=row[4],
+        private=bool(row[5]),
+        keys=row[6],
+        ts=row[7]
+    )
+
 
 class MemoryDAO:
     """
@@ -30,57 +191,189 @@ class MemoryDAO:
             db_path: Path to SQLite database file. If None, uses settings.db_path
         """
         self.db_path = db_path or settings.db_path
-        self._init_db()
+        # One long-lived connection per thread (asyncio.to_thread workers
+        # included) so the page cache stays warm between calls. Every
+        # connection to ":memory:" is a separate database, so an in-memory
+        # DAO (used by the tests) shares a single connection instead, and
+        # transactions on it are serialized so to_thread workers can't
+        # interleave their BEGIN/COMMIT/ROLLBACK.
+        self._in_memory = self.db_path == ":memory:"
+        self._shared_conn_lock = threading.RLock() if self._in_memory else nullcontext()
+        self._local = self._new_local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # (npc_id, player_id, k, min_salience) -> (cached_at, generation, rows)
+        self._top_cache: "OrderedDict[tuple, Tuple[float, tuple, List[MemoryEntry]]]" = OrderedDict()
+        # Bumped per (npc_id, player_id) on every write for that pair, and
+        # for all pairs at once (the epoch) on deletes
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self._epoch = 0
+        # npc_id (None = all NPCs) -> (cached_at, count)
+        self._count_cache: Dict[Optional[str], Tuple[float, int]] = {}
+        self._count_version = 0
+        self._cache_lock = threading.Lock()
+        # Schema setup runs on first use (or an explicit init_db() at app
+        # startup), not here, so importing the module touches no files
+        self._initialized = False
+        self._init_lock = threading.Lock()
         logger.info(f"MemoryDAO initialized with database: {self.db_path}")
     
+    def _new_local(self):
+        """Per-thread connection holder (shared by all threads in memory)."""
+        return SimpleNamespace() if self._in_memory else threading.local()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False so close() can run from any thread and,
+            # in memory, so every thread can use the one shared connection
+            # (under _shared_conn_lock). File connections are only ever used
+            # by the thread that opened them.
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=128
+            )
+            for pragma in _CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
     @contextmanager
     def _get_connection(self):
-        """Context manager for database connections."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
-        try:
+        """Context manager for a transaction on this thread's connection."""
+        if not self._initialized:
+            self.init_db()
+        with self._transaction() as conn:
             yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Database error: {e}")
-            raise
-        finally:
-            conn.close()
+    
+    @contextmanager
+    def _transaction(self):
+        """Commit or roll back on this thread's connection; no schema check."""
+        with self._shared_conn_lock:
+            conn = self._connect()
+            try:
+                yield conn
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+    
+    def close(self):
+        """Close every pooled connection. Later calls reconnect lazily."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = self._new_local()
+        # An in-memory database is gone once its connection closes
+        if self._in_memory:
+            self._initialized = False
+    
+    def init_db(self):
+        """
+        Create or migrate the schema if needed. Safe to call repeatedly.
+        
+        Called by the app at startup; any DAO method also calls it on first
+        use, so scripts and tests need not.
+        """
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                self._init_db()
+                self._initialized = True
     
     def _init_db(self):
-        """Create tables and indexes if they don't exist."""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        """Create tables and indexes unless user_version says they're current."""
+        with self._transaction() as conn:
+            # One integer read from the header; skips all DDL on a normal start
+            if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+                return
+            
+            # Let delete_old_memories hand freed pages back to the OS without a
+            # full VACUUM. The mode can only be set before the first table is
+            # created; an older database needs a one-time VACUUM to switch.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                logger.info("Rebuilding database to enable incremental auto-vacuum")
+                conn.execute("VACUUM")
+            
+            # WAL lets readers run alongside a writer and avoids an fsync per
+            # commit. It is stored in the database file, so setting it once
+            # here covers every later connection. Needs a local filesystem.
+            conn.execute("PRAGMA journal_mode=WAL")
+            
+            # Serialize schema setup across worker processes starting together;
+            # if another one finished while we waited, there's nothing to do
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+                return
             
             # Main memory table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS npc_memory (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    npc_id TEXT NOT NULL,
-                    player_id TEXT NOT NULL,
-                    text TEXT NOT NULL,
-                    salience INTEGER NOT NULL CHECK(salience >= 0 AND salience <= 3),
-                    private INTEGER NOT NULL DEFAULT 1,
-                    keys TEXT,
-                    ts INTEGER NOT NULL
-                )
-            """)
+            existing = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'npc_memory'"
+            ).fetchone()
+            if existing is not None and "WITHOUT ROWID" not in existing[0].upper():
+                self._migrate_to_without_rowid(conn)
+            else:
+                conn.execute(_CREATE_TABLE_SQL)
             
-            # Index for efficient querying by npc_id, player_id, salience, and recency
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_mem_query 
-                ON npc_memory(npc_id, player_id, salience DESC, ts DESC)
+            # Unique id lookup; also makes MAX(id) for new rows an index seek
+            conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_mem_id
+                ON npc_memory(id)
             """)
             
-            # Index for timestamp-based cleanup
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_mem_ts 
-                ON npc_memory(ts)
+            # Covering index for top(): the key matches its WHERE + ORDER BY and
+            # the trailing columns hold the rest of the SELECT, so results
+            # come straight from the index without a table lookup per row
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_mem_top_covering
+                ON npc_memory(npc_id, player_id, salience DESC, ts DESC, id DESC, text, private, keys)
             """)
+            # keys used to be stored as a JSON array; convert to tab-joined
+            conn.execute("""
+                UPDATE npc_memory
+                SET keys = (SELECT group_concat(value, char(9)) FROM json_each(npc_memory.keys))
+                WHERE keys LIKE '[%' AND json_valid(keys)
+            """)
+            
+            # Indexes from earlier schemas. idx_mem_query is superseded by
+            # idx_mem_top_covering; idx_mem_ts only served the occasional
+            # delete_old_memories sweep, which can afford a full scan, yet
+            # cost an extra B-tree update on every insert.
+            conn.execute("DROP INDEX IF EXISTS idx_mem_query")
+            conn.execute("DROP INDEX IF EXISTS idx_mem_ts")
             
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             logger.info("Database schema initialized")
     
+    @staticmethod
+    def _migrate_to_without_rowid(conn: sqlite3.Connection):
+        """
+        Rebuild a rowid-based npc_memory table as WITHOUT ROWID, keeping ids.
+        
+        Runs inside _init_db's transaction. The old table's indexes are
+        dropped along with it and recreated by _init_db.
+        
+        Args:
+            conn: The connection running _init_db
+        """
+        conn.execute("ALTER TABLE npc_memory RENAME TO npc_memory_old")
+        conn.execute(_CREATE_TABLE_SQL)
+        conn.execute("""
+            INSERT INTO npc_memory (id, npc_id, player_id, text, salience, private, keys, ts)
+            SELECT id, npc_id, player_id, text, salience, private, keys, ts
+            FROM npc_memory_old
+        """)
+        conn.execute("DROP TABLE npc_memory_old")
+        logger.info("Migrated npc_memory to a WITHOUT ROWID table")
+    
     def write(
         self,
         npc_id: str,
@@ -106,28 +399,114 @@ class MemoryDAO:
         Returns:
             ID of the inserted row
         """
+        row = self._build_row(npc_id, player_id, text, salience, private, keys, ts)
+        
+        with self._get_connection() as conn:
+            row_id = conn.execute(_INSERT_RETURNING_SQL, row).fetchone()[0]
+        
+        self._invalidate_caches([(npc_id, player_id)])
+        logger.info("Wrote memory %d: npc=%s, salience=%d", row_id, npc_id, salience)
+        return row_id
+    
+    def write_many(
+        self,
+        npc_id: str,
+        player_id: str,
+        writes: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Write several memory entries for one NPC/player in a single transaction.
+        
+        Used for the memory_writes list of a dialogue turn: one executemany and
+        one commit instead of a commit per row.
+        
+        Args:
+            npc_id: NPC identifier
+            player_id: Player identifier
+            writes: Dicts with text, salience, and optional private/keys/ts
+        
+        Returns:
+            Number of rows inserted
+        """
+        rows = [
+            self._build_row(
+                npc_id,
+                player_id,
+                w["text"],
+                w["salience"],
+                w.get("private", True),
+                w.get("keys"),
+                w.get("ts")
+            )
+            for w in writes
+        ]
+        if not rows:
+            return 0
+        
+        with self._get_connection() as conn:
+            conn.executemany(_INSERT_SQL, rows)
+        
+        self._invalidate_caches([(npc_id, player_id)])
+        logger.info("Wrote %d memories: npc=%s, player=%s", len(rows), npc_id, player_id)
+        return len(rows)
+    
+    def write_many_from_models(self, memories: List[NpcMemoryWrite]) -> int:
+        """
+        Write several memories, possibly for different NPCs/players, in one
+        transaction.
+        
+        Args:
+            memories: NpcMemoryWrite instances
+        
+        Returns:
+            Number of rows inserted
+        """
+        rows = [
+            self._build_row(
+                m.npc_id,
+                m.player_id,
+                m.text,
+                m.salience,
+                m.private,
+                m.keys,
+                None
+            )
+            for m in memories
+        ]
+        if not rows:
+            return 0
+        
+        with self._get_connection() as conn:
+            conn.executemany(_INSERT_SQL, rows)
+        
+        self._invalidate_caches({(m.npc_id, m.player_id) for m in memories})
+        logger.info("Wrote %d memories in one batch", len(rows))
+        return len(rows)
+    
+    @staticmethod
+    def _build_row(
+        npc_id: str,
+        player_id: str,
+        text: str,
+        salience: int,
+        private: bool,
+        keys: Optional[List[str]],
+        ts: Optional[int]
+    ) -> tuple:
+        """Validate one memory and convert it to an INSERT parameter tuple."""
         if not (0 <= salience <= 3):
             raise ValueError(f"Salience must be 0-3, got {salience}")
         
         if len(text) > 160:
-            logger.warning(f"Memory text truncated from {len(text)} to 160 chars")
+            logger.warning("Memory text truncated from %d to 160 chars", len(text))
             text = text[:160]
         
         ts = ts or int(time.time())
-        keys_json = json.dumps(keys) if keys else None
+        # Tab-joined rather than JSON: nothing on either side needs a parser.
+        # Tabs inside a key would split it on read, so they become spaces.
+        keys_str = "\t".join(k.replace("\t", " ") for k in keys) if keys else None
         
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO npc_memory (npc_id, player_id, text, salience, private, keys, ts)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (npc_id, player_id, text, salience, int(private), keys_json, ts)
-            )
-            row_id = cursor.lastrowid
-            logger.info(f"Wrote memory {row_id}: npc={npc_id}, salience={salience}")
-            return row_id
+        return (npc_id, player_id, text, salience, int(private), keys_str, ts)
     
     def write_from_model(self, memory: NpcMemoryWrite) -> int:
         """
@@ -153,7 +532,8 @@ class MemoryDAO:
         npc_id: str,
         player_id: str,
         k: int = 3,
-        min_salience: int = 0
+        min_salience: int = 0,
+        cursor: Optional[Tuple[int, int, int]] = None
     ) -> List[MemoryEntry]:
         """
         Retrieve top-k memories ordered by salience (desc) then recency (desc).
@@ -163,46 +543,71 @@ class MemoryDAO:
             player_id: Player identifier
             k: Number of memories to retrieve
             min_salience: Minimum salience threshold (default 0)
+            cursor: (salience, ts, id) of the last memory on the previous
+                page; only memories ranked after it are returned
         
         Returns:
             List of MemoryEntry objects, most salient/recent first
         """
+        if cursor is None:
+            cache_key = (npc_id, player_id, k, min_salience)
+            with self._cache_lock:
+                generation = (self._epoch, self._generations.get((npc_id, player_id), 0))
+                hit = self._top_cache.get(cache_key)
+                if (
+                    hit is not None
+                    and hit[1] == generation
+                    and time.monotonic() - hit[0] < TOP_CACHE_TTL_S
+                ):
+                    self._top_cache.move_to_end(cache_key)
+                    return list(hit[2])
+        
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT id, npc_id, player_id, text, salience, private, keys, ts
-                FROM npc_memory
-                WHERE npc_id = ? AND player_id = ? AND salience >= ?
-                ORDER BY salience DESC, ts DESC
-                LIMIT ?
-                """,
-                (npc_id, player_id, min_salience, k)
-            )
-            
-            rows = cursor.fetchall()
-            memories = [
-                MemoryEntry(
-                    id=row["id"],
-                    npc_id=row["npc_id"],
-                    player_id=row["player_id"],
-                    text=row["text"],
-                    salience=row["salience"],
-                    private=bool(row["private"]),
-                    keys=row["keys"],
-                    ts=row["ts"]
+            if cursor is not None:
+                rows = conn.execute(
+                    _TOP_AFTER_SQL, (npc_id, player_id, min_salience, *cursor, k)
                 )
-                for row in rows
-            ]
+            elif min_salience > 0:
+                rows = conn.execute(
+                    _TOP_MIN_SALIENCE_SQL, (npc_id, player_id, min_salience, k)
+                )
+            else:
+                rows = conn.execute(_TOP_SQL, (npc_id, player_id, k))
             
-            logger.debug(f"Retrieved {len(memories)} memories for npc={npc_id}, player={player_id}")
-            return memories
+            memories = [_entry_from_row(row) for row in rows]
+            
+            logger.debug("Retrieved %d memories for npc=%s, player=%s", len(memories), npc_id, player_id)
+        
+        if cursor is None:
+            with self._cache_lock:
+                # generation was read before the query, so a write that landed
+                # in between leaves this entry already stale
+                self._top_cache[cache_key] = (time.monotonic(), generation, memories)
+                self._top_cache.move_to_end(cache_key)
+                if len(self._top_cache) > TOP_CACHE_MAXSIZE:
+                    self._top_cache.popitem(last=False)
+        return list(memories)
+    
+    def _invalidate_caches(self, pairs) -> None:
+        """
+        Mark cached top() results and counts stale after a committed write.
+        
+        Args:
+            pairs: Iterable of (npc_id, player_id) tuples that were written
+        """
+        with self._cache_lock:
+            self._count_version += 1
+            self._count_cache.pop(None, None)
+            for pair in pairs:
+                self._generations[pair] = self._generations.get(pair, 0) + 1
+                self._count_cache.pop(pair[0], None)
     
     def get_all_for_npc(
         self,
         npc_id: str,
         player_id: Optional[str] = None,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[Tuple[int, int]] = None
     ) -> List[MemoryEntry]:
         """
         Get all memories for an NPC, optionally filtered by player.
@@ -211,55 +616,60 @@ class MemoryDAO:
             npc_id: NPC identifier
             player_id: Optional player filter
             limit: Max results (default 100)
+            cursor: (ts, id) of the last memory on the previous page; only
+                older memories are returned
         
         Returns:
-            List of MemoryEntry objects
+            List of MemoryEntry objects, newest first
+        """
+        return list(self.iter_for_npc(npc_id, player_id, limit, cursor))
+    
+    def iter_for_npc(
+        self,
+        npc_id: str,
+        player_id: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[Tuple[int, int]] = None
+    ) -> Iterator[MemoryEntry]:
+        """
+        Stream memories for an NPC one row at a time, newest first.
+        
+        Same query as get_all_for_npc(), but rows are converted as the SQLite
+        cursor advances instead of being collected into a list. The
+        connection is in use until the iterator is exhausted or closed, so
+        consume it on the thread that created it.
+        
+        Args:
+            npc_id: NPC identifier
+            player_id: Optional player filter
+            limit: Max results (default 100)
+            cursor: (ts, id) of the last memory on the previous page
+        
+        Yields:
+            MemoryEntry objects
         """
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
             if player_id:
-                cursor.execute(
-                    """
-                    SELECT id, npc_id, player_id, text, salience, private, keys, ts
-                    FROM npc_memory
-                    WHERE npc_id = ? AND player_id = ?
-                    ORDER BY ts DESC
-                    LIMIT ?
-                    """,
-                    (npc_id, player_id, limit)
-                )
+                if cursor is None:
+                    rows = conn.execute(_ALL_FOR_PLAYER_SQL, (npc_id, player_id, limit))
+                else:
+                    rows = conn.execute(
+                        _ALL_FOR_PLAYER_AFTER_SQL, (npc_id, player_id, *cursor, limit)
+                    )
             else:
-                cursor.execute(
-                    """
-                    SELECT id, npc_id, player_id, text, salience, private, keys, ts
-                    FROM npc_memory
-                    WHERE npc_id = ?
-                    ORDER BY ts DESC
-                    LIMIT ?
-                    """,
-                    (npc_id, limit)
-                )
+                if cursor is None:
+                    rows = conn.execute(_ALL_FOR_NPC_SQL, (npc_id, limit))
+                else:
+                    rows = conn.execute(_ALL_FOR_NPC_AFTER_SQL, (npc_id, *cursor, limit))
             
-            rows = cursor.fetchall()
-            return [
-                MemoryEntry(
-                    id=row["id"],
-                    npc_id=row["npc_id"],
-                    player_id=row["player_id"],
-                    text=row["text"],
-                    salience=row["salience"],
-                    private=bool(row["private"]),
-                    keys=row["keys"],
-                    ts=row["ts"]
-                )
-                for row in rows
-            ]
+            for row in rows:
+                yield _entry_from_row(row)
     
     def delete_old_memories(self, days_old: int = 30) -> int:
         """
         Delete memories older than specified days.
-        Useful for keeping database size manageable.
+        Useful for keeping database size manageable. There is deliberately
+        no index on ts, so this is a full table scan.
         
         Args:
             days_old: Delete memories older than this many days
@@ -270,14 +680,42 @@ class MemoryDAO:
         cutoff_ts = int(time.time()) - (days_old * 24 * 60 * 60)
         
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "DELETE FROM npc_memory WHERE ts < ?",
-                (cutoff_ts,)
-            )
-            deleted = cursor.rowcount
-            logger.info(f"Deleted {deleted} memories older than {days_old} days")
-            return deleted
+            deleted = conn.execute(_DELETE_OLD_SQL, (cutoff_ts,)).rowcount
+        
+        if deleted:
+            # Return freed pages to the OS and fold the (now large) WAL back
+            # into the main file so it doesn't keep growing. Both must run
+            # outside a transaction, hence after the DELETE has committed.
+            # executescript steps incremental_vacuum to completion; execute()
+            # would stop after the first page.
+            with self._get_connection() as conn:
+                conn.executescript(
+                    f"PRAGMA incremental_vacuum({_VACUUM_PAGES});"
+                    "PRAGMA wal_checkpoint(TRUNCATE);"
+                )
+        
+        # Any pair may have lost rows
+        with self._cache_lock:
+            self._epoch += 1
+            self._count_version += 1
+            self._count_cache.clear()
+        logger.info("Deleted %d memories older than %d days", deleted, days_old)
+        return deleted
+    
+    def truncate(self) -> None:
+        """
+        Delete every memory and reset the read caches, keeping the schema.
+        Cheaper than rebuilding the database between tests.
+        """
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM npc_memory")
+        
+        with self._cache_lock:
+            self._top_cache.clear()
+            self._generations.clear()
+            self._epoch += 1
+            self._count_version += 1
+            self._count_cache.clear()
     
     def count_memories(self, npc_id: Optional[str] = None) -> int:
         """
@@ -289,17 +727,60 @@ class MemoryDAO:
         Returns:
             Memory count
         """
+        key = npc_id or None
+        with self._cache_lock:
+            hit = self._count_cache.get(key)
+            if hit is not None and time.monotonic() - hit[0] < COUNT_CACHE_TTL_S:
+                return hit[1]
+            version = self._count_version
+        
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            if npc_id:
-                cursor.execute(
-                    "SELECT COUNT(*) as count FROM npc_memory WHERE npc_id = ?",
-                    (npc_id,)
-                )
+            if key:
+                count = conn.execute(_COUNT_FOR_NPC_SQL, (key,)).fetchone()[0]
             else:
-                cursor.execute("SELECT COUNT(*) as count FROM npc_memory")
-            
-            return cursor.fetchone()["count"]
+                count = conn.execute(_COUNT_SQL).fetchone()[0]
+        
+        with self._cache_lock:
+            # Skip caching if a write or delete committed while we counted
+            if self._count_version == version:
+                self._count_cache[key] = (time.monotonic(), count)
+        return count
+
+    
+    # ------------------------------------------------------------------
+    # Async wrappers
+    # ------------------------------------------------------------------
+    # sqlite3 calls block, so the FastAPI handlers use these to run the
+    # query on a worker thread and keep the event loop free for other
+    # WebSocket connections.
+    
+    async def write_async(self, *args, **kwargs) -> int:
+        """Async version of write(); runs on a worker thread."""
+        return await asyncio.to_thread(self.write, *args, **kwargs)
+    
+    async def write_many_async(self, *args, **kwargs) -> int:
+        """Async version of write_many(); runs on a worker thread."""
+        return await asyncio.to_thread(self.write_many, *args, **kwargs)
+    
+    async def write_many_from_models_async(self, memories: List[NpcMemoryWrite]) -> int:
+        """Async version of write_many_from_models(); runs on a worker thread."""
+        return await asyncio.to_thread(self.write_many_from_models, memories)
+    
+    async def write_from_model_async(self, memory: NpcMemoryWrite) -> int:
+        """Async version of write_from_model(); runs on a worker thread."""
+        return await asyncio.to_thread(self.write_from_model, memory)
+    
+    async def top_async(self, *args, **kwargs) -> List[MemoryEntry]:
+        """Async version of top(); runs on a worker thread."""
+        return await asyncio.to_thread(self.top, *args, **kwargs)
+    
+    async def get_all_for_npc_async(self, *args, **kwargs) -> List[MemoryEntry]:
+        """Async version of get_all_for_npc(); runs on a worker thread."""
+        return await asyncio.to_thread(self.get_all_for_npc, *args, **kwargs)
+    
+    async def count_memories_async(self, npc_id: Optional[str] = None) -> int:
+        """Async version of count_memories(); runs on a worker thread."""
+        return await asyncio.to_thread(self.count_memories, npc_id)
 
 
 # Global DAO instance
@@ -3,7 +3,7 @@ Pydantic models and JSON Schema definitions for RPGAI.
 Contains the structured output schema for Gemini and data models for API contracts.
 """
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 from enum import Enum
 
 
@@ -73,7 +73,7 @@ NPC_DIALOGUE_SCHEMA = {
         },
         "emotion": {
             "type": "string",
-            "enum": ["neutral", "happy", "angry", "fear", "sad", "surprised", "disgust"],
+            "enum": [e.value for e in Emotion],
             "description": "Current emotional state"
         },
         "style_tags": {
@@ -81,14 +81,13 @@ NPC_DIALOGUE_SCHEMA = {
             "maxItems": 3,
             "items": {
                 "type": "string",
-                "enum": ["formal", "casual", "whisper", "shout", "mystical", "guarded", "teasing", "urgent"]
+                "enum": [t.value for t in StyleTag]
             },
             "description": "Speech style modifiers"
         },
         "behavior_directive": {
             "type": "string",
-            "enum": ["none", "approach", "step_back", "flee", "attack", "call_guard", 
-                    "give_item", "start_quest", "open_shop", "heal_player"],
+            "enum": [b.value for b in BehaviorDirective],
             "description": "Action the NPC should perform"
         },
         "memory_writes": {
@@ -147,7 +146,7 @@ NPC_DIALOGUE_SCHEMA = {
                 },
                 "ssml_style": {
                     "type": "string",
-                    "enum": ["default", "narration", "whispered", "shouted", "urgent", "calm"],
+                    "enum": [s.value for s in SSMLStyle],
                     "description": "SSML rendering style"
                 }
             },
@@ -195,6 +194,11 @@ class NpcDialogueResponse(BaseModel):
     voice_hint: Optional[VoiceHint] = None
 
 
+# Parses raw JSON straight into the model in pydantic-core, with no
+# intermediate dict; built once so the validator is compiled only at import
+NPC_DIALOGUE_ADAPTER = TypeAdapter(NpcDialogueResponse)
+
+
 class Persona(BaseModel):
     """NPC personality definition."""
     name: str
@@ -242,8 +246,13 @@ class MemoryEntry(BaseModel):
     text: str
     salience: int
     private: bool
-    keys: Optional[str] = None  # stored as JSON string in DB
+    keys: Optional[str] = None  # tab-separated keywords, as stored in DB
     ts: int  # Unix timestamp
+    
+    @property
+    def keys_list(self) -> List[str]:
+        """Keywords split out of the stored tab-separated string."""
+        return self.keys.split("\t") if self.keys else []
 
 
 class TTSRequest(BaseModel):
@@ -252,6 +261,20 @@ class TTSRequest(BaseModel):
     voice_name: str = Field(default="en-US-Neural2-C")
 
 
+class TTSStreamRequest(BaseModel):
+    """Streaming TTS request (plain text; streaming voices do not take SSML)."""
+    text: str = Field(description="Utterance text")
+    voice_name: str = Field(default="en-US-Journey-F")
+
+
+class TTSSentencesRequest(BaseModel):
+    """Sentence-pipelined TTS request, mirroring an NPC response's fields."""
+    text: str = Field(description="Utterance text")
+    emotion: Optional[Emotion] = None
+    voice_preset: Optional[str] = None
+    ssml_style: Optional[SSMLStyle] = None
+
+
 class TTSResponse(BaseModel):
     """TTS synthesis response."""
     audio_url: str
@@ -283,17 +306,19 @@ HARD RULES:
 
 PERSONALITY ADAPTATION:
 - Match the persona's values, quirks, and backstory.
+- Choose a fitting emotion that matches the subtext.
 - Let emotion guide word choice (angry → curt; happy → warm).
 - Use retrieved memories to maintain continuity.
+- voice_hint: choose a calm, context-appropriate voice unless the situation suggests otherwise.
 
 ACTION LOGIC:
 - reputation < 0: be guarded or hostile.
 - reputation > 10: be helpful and warm.
-- Wrongdoing → 'call_guard' or 'step_back'.
+- Severe wrongdoing → 'call_guard' or 'step_back'.
 - Kindness → 'open_shop' or 'give_item'.
 
 MEMORY:
-- Write at most 1 memory_writes entry per turn.
+- Write at most 1 memory_writes entry per turn, only if something notable happened.
 - Only record notable interactions (salience ≥ 1).
 """
 
@@ -21,6 +21,7 @@ class Settings(BaseSettings):
     
     # Google Cloud TTS
     google_application_credentials: str = ""
+    tts_concurrency: int = 3  # max in-flight synthesize requests
     
     # Server
     host: str = "0.0.0.0"
@@ -39,6 +40,10 @@ class Settings(BaseSettings):
     top_p: float = 0.9
     max_output_tokens: int = 220
     
+    # Response cache (only used when temperature == 0)
+    response_cache_size: int = 1024
+    response_cache_ttl: int = 300  # seconds
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -4,6 +4,8 @@ Transcribes player audio input to text for dialogue processing.
 """
 import logging
 from typing import Optional
+
+import google.auth
 from google.cloud import speech_v1
 from google.cloud.speech_v1 import types
 
@@ -11,6 +13,22 @@ from .settings import settings
 
 logger = logging.getLogger(__name__)
 
+_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+# Player utterances are short (well under the 60s sync recognize limit), and
+# latest_short is tuned for that: it finalizes sooner and costs less than
+# "default". Switch to "latest_long" for narration-length audio.
+STT_MODEL = "latest_short"
+
+# File extension -> GCP encoding
+_ENCODING_MAP = {
+    "wav": speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
+    "mp3": speech_v1.RecognitionConfig.AudioEncoding.MP3,
+    "flac": speech_v1.RecognitionConfig.AudioEncoding.FLAC,
+    "ogg": speech_v1.RecognitionConfig.AudioEncoding.OGG_OPUS,
+    "webm": speech_v1.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+}
+
 
 class STTClient:
     """
@@ -19,13 +37,43 @@ class STTClient:
     """
     
     def __init__(self):
-        """Initialize the STT client."""
+        """
+        Initialize the STT client.
+        
+        Credential discovery (google.auth.default) blocks, so it runs once
+        here and the result is shared with the async client.
+        """
+        self._credentials = None
         try:
-            self.client = speech_v1.SpeechClient()
+            self._credentials, _ = google.auth.default(scopes=_SCOPES)
+            self.client = speech_v1.SpeechClient(credentials=self._credentials)
             logger.info("STTClient initialized successfully")
         except Exception as e:
             logger.warning(f"Failed to initialize STT client: {e}")
             self.client = None
+        
+        # The async (gRPC aio) client binds to the event loop it is created
+        # on, so it is built lazily on first use from inside that loop.
+        # With credentials already resolved that build does no blocking I/O;
+        # a failure is remembered rather than retried on every request.
+        self._async_client: Optional[speech_v1.SpeechAsyncClient] = None
+        self._async_client_failed = self._credentials is None
+    
+    async def aclose(self):
+        """Close the async client's gRPC channel if it was ever opened."""
+        if self._async_client is not None:
+            await self._async_client.transport.close()
+            self._async_client = None
+    
+    def _get_async_client(self) -> Optional[speech_v1.SpeechAsyncClient]:
+        """Return the async client, creating it on first call."""
+        if self._async_client is None and not self._async_client_failed:
+            try:
+                self._async_client = speech_v1.SpeechAsyncClient(credentials=self._credentials)
+            except Exception as e:
+                logger.warning(f"Failed to initialize async STT client: {e}")
+                self._async_client_failed = True
+        return self._async_client
     
     def transcribe(
         self,
@@ -60,7 +108,7 @@ class STTClient:
                 sample_rate_hertz=sample_rate_hertz,
                 language_code=language_code,
                 enable_automatic_punctuation=True,
-                model="default",  # Use "latest_long" for better quality on longer audio
+                model=STT_MODEL,
             )
             
             # Perform synchronous recognition
@@ -98,41 +146,62 @@ class STTClient:
         Returns:
             Transcribed text, or None if failed
         """
-        # Map file format to GCP encoding
-        encoding_map = {
-            "wav": speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
-            "mp3": speech_v1.RecognitionConfig.AudioEncoding.MP3,
-            "flac": speech_v1.RecognitionConfig.AudioEncoding.FLAC,
-            "ogg": speech_v1.RecognitionConfig.AudioEncoding.OGG_OPUS,
-            "webm": speech_v1.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-        }
-        
-        encoding = encoding_map.get(file_format.lower(), speech_v1.RecognitionConfig.AudioEncoding.LINEAR16)
-        
         if not self.client:
             logger.error("STT client not initialized")
             return None
         
         try:
-            # Configure audio
             audio = types.RecognitionAudio(content=audio_content)
+            config = self._file_format_config(file_format, language_code)
             
-            # Configure recognition - GCP can auto-detect sample rate from WAV headers
-            # For compressed formats (MP3, FLAC, etc.), sample rate is also auto-detected
-            config_args = {
-                "encoding": encoding,
-                "language_code": language_code,
-                "enable_automatic_punctuation": True,
-                "model": "default",
-            }
+            # Perform synchronous recognition
+            response = self.client.recognize(config=config, audio=audio)
             
-            # Don't set sample_rate_hertz - let GCP auto-detect from file header
-            # This works for both WAV (reads from header) and compressed formats
+            if not response.results:
+                logger.warning("No transcription results returned")
+                return None
             
-            config = types.RecognitionConfig(**config_args)
+            # Get the best transcription
+            transcription = response.results[0].alternatives[0].transcript
+            confidence = response.results[0].alternatives[0].confidence
             
-            # Perform synchronous recognition
-            response = self.client.recognize(config=config, audio=audio)
+            logger.info(f"Transcribed: '{transcription}' (confidence: {confidence:.2f})")
+            return transcription.strip()
+            
+        except Exception as e:
+            logger.error(f"STT transcription failed: {e}", exc_info=True)
+            return None
+    
+    async def transcribe_from_file_format_async(
+        self,
+        audio_content: bytes,
+        file_format: str = "wav",
+        language_code: str = "en-US"
+    ) -> Optional[str]:
+        """
+        Async version of transcribe_from_file_format().
+        
+        Uses the gRPC async client, so the event loop keeps serving other
+        requests while the recognize call is in flight.
+        
+        Args:
+            audio_content: Raw audio bytes
+            file_format: File format (wav, mp3, flac, ogg, webm)
+            language_code: Language code
+        
+        Returns:
+            Transcribed text, or None if failed
+        """
+        client = self._get_async_client()
+        if not client:
+            logger.error("STT client not initialized")
+            return None
+        
+        try:
+            audio = types.RecognitionAudio(content=audio_content)
+            config = self._file_format_config(file_format, language_code)
+            
+            response = await client.recognize(config=config, audio=audio)
             
             if not response.results:
                 logger.warning("No transcription results returned")
@@ -148,6 +217,29 @@ class STTClient:
         except Exception as e:
             logger.error(f"STT transcription failed: {e}", exc_info=True)
             return None
+    
+    @staticmethod
+    def _file_format_config(file_format: str, language_code: str) -> types.RecognitionConfig:
+        """
+        Build the recognition config for an uploaded audio file.
+        
+        Args:
+            file_format: File format (wav, mp3, flac, ogg, webm)
+            language_code: Language code
+        
+        Returns:
+            RecognitionConfig with the matching encoding
+        """
+        encoding = _ENCODING_MAP.get(file_format.lower(), speech_v1.RecognitionConfig.AudioEncoding.LINEAR16)
+        
+        # Don't set sample_rate_hertz - let GCP auto-detect from file header
+        # This works for both WAV (reads from header) and compressed formats
+        return types.RecognitionConfig(
+            encoding=encoding,
+            language_code=language_code,
+            enable_automatic_punctuation=True,
+            model=STT_MODEL,
+        )
 
 
 # Global STT client instance
@@ -161,7 +253,7 @@ def transcribe_audio(
 ) -> Optional[str]:
     """
     Convenience function for transcribing audio.
-    This is what the FastAPI endpoint calls.
+    Blocks on the gRPC call; from async code use transcribe_audio_async.
     
     Args:
         audio_content: Raw audio bytes
@@ -173,3 +265,24 @@ def transcribe_audio(
     """
     return stt_client.transcribe_from_file_format(audio_content, file_format, language_code)
 
+
+async def transcribe_audio_async(
+    audio_content: bytes,
+    file_format: str = "wav",
+    language_code: str = "en-US"
+) -> Optional[str]:
+    """
+    Async convenience function for transcribing audio.
+    This is what the FastAPI endpoint calls.
+    
+    Args:
+        audio_content: Raw audio bytes
+        file_format: Audio file format (wav, mp3, flac, ogg, webm)
+        language_code: Language code (default: en-US)
+    
+    Returns:
+        Transcribed text, or None if failed
+    """
+    return await stt_client.transcribe_from_file_format_async(
+        audio_content, file_format, language_code
+    )
@@ -2,17 +2,113 @@
 Google Cloud Text-to-Speech integration with SSML support.
 Converts NPC utterances to audio files for Unity playback.
 """
-import uuid
+import asyncio
+import hashlib
 import logging
+import re
+import uuid
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+import google.auth
+from cachetools import LRUCache
 from google.cloud import texttospeech
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import (
+    TextToSpeechGrpcAsyncIOTransport,
+    TextToSpeechGrpcTransport,
+)
 
 from .schemas import Emotion, SSMLStyle
 from .settings import settings
 
 logger = logging.getLogger(__name__)
 
+TTS_ENDPOINT = "texttospeech.googleapis.com:443"
+_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+# Library defaults plus keepalive pings, so the HTTP/2 connection survives the
+# idle gaps between NPC turns instead of paying a fresh TLS handshake
+_CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
+
+# Streaming synthesis only supports the Journey/Chirp HD voices and returns
+# headerless 16-bit mono PCM at this sample rate
+STREAMING_VOICE = "en-US-Journey-F"
+STREAMING_SAMPLE_RATE = 24000
+STREAMING_MEDIA_TYPE = f"audio/L16; rate={STREAMING_SAMPLE_RATE}; channels=1"
+STREAMING_CHUNK_SIZE = 8192
+
+# (rate, pitch, volume) per emotion; emotions not listed use the default
+_DEFAULT_PROSODY = ("100%", "+0st", "medium")
+_EMOTION_PROSODY = {
+    Emotion.ANGRY: ("105%", "+2st", "loud"),
+    Emotion.HAPPY: ("105%", "+1st", "medium"),
+    Emotion.SAD: ("92%", "-1st", "soft"),
+    Emotion.FEAR: ("110%", "+3st", "soft"),
+    Emotion.SURPRISED: ("108%", "+2st", "medium"),
+    Emotion.DISGUST: ("95%", "-2st", "medium"),
+}
+
+# Style overrides applied on top of the emotion; None keeps the emotion's value
+_STYLE_PROSODY = {
+    SSMLStyle.WHISPERED: ("95%", None, "x-soft"),
+    SSMLStyle.SHOUTED: ("110%", "+3st", "x-loud"),
+    SSMLStyle.URGENT: ("115%", None, None),
+    SSMLStyle.CALM: ("92%", "-1st", None),
+    SSMLStyle.NARRATION: ("98%", None, None),
+}
+
+
+def _prosody_for(
+    emotion: Optional[Emotion],
+    style: Optional[SSMLStyle]
+) -> Tuple[str, str, str]:
+    """Apply a style's overrides on top of an emotion's (rate, pitch, volume)."""
+    rate, pitch, volume = _EMOTION_PROSODY.get(emotion, _DEFAULT_PROSODY)
+    override = _STYLE_PROSODY.get(style)
+    if override:
+        rate = override[0] or rate
+        pitch = override[1] or pitch
+        volume = override[2] or volume
+    return rate, pitch, volume
+
+
+# Every (emotion, style) pair resolved once, so build_ssml is a single lookup
+_COMBINED = MappingProxyType({
+    (emotion, style): _prosody_for(emotion, style)
+    for emotion in [*Emotion, None]
+    for style in [*SSMLStyle, None]
+})
+
+_SSML_TMPL = '<speak><prosody rate="{}" pitch="{}" volume="{}">{}</prosody></speak>'
+
+# Sentence boundary: whitespace following terminal punctuation
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# Streamed clips arrive as many small chunks; buffer them so the cache file
+# costs a handful of write() syscalls instead of one per chunk
+STREAM_WRITE_BUFFER = 512 * 1024
+
+
+def audio_cache_key(ssml: str, voice_name: str, language_code: str) -> str:
+    """
+    Content-addressed key for a synthesized clip.
+    
+    Identical (voice, language, SSML) inputs always produce the same audio,
+    so the key doubles as the mp3 filename and lets repeated lines skip TTS.
+    """
+    return hashlib.blake2b(
+        f"{voice_name}|{language_code}|{ssml}".encode(),
+        digest_size=16
+    ).hexdigest()
+
 
 class TTSClient:
     """
@@ -21,13 +117,92 @@ class TTSClient:
     """
     
     def __init__(self):
-        """Initialize the TTS client."""
+        """
+        Initialize the TTS client.
+        
+        Blocks on Google credential discovery, so construct it off the event
+        loop (get_tts_client() does). The result, success or failure, is kept
+        for the client's lifetime rather than retried per request.
+        """
+        self._credentials = None
         try:
-            self.client = texttospeech.TextToSpeechClient()
+            self._credentials, _ = google.auth.default(scopes=_SCOPES)
+            channel = TextToSpeechGrpcTransport.create_channel(
+                TTS_ENDPOINT, credentials=self._credentials, options=_CHANNEL_OPTIONS
+            )
+            self.client = texttospeech.TextToSpeechClient(
+                transport=TextToSpeechGrpcTransport(channel=channel)
+            )
             logger.info("TTSClient initialized successfully")
         except Exception as e:
             logger.warning(f"Failed to initialize TTS client: {e}")
             self.client = None
+        
+        # The async (gRPC aio) client binds to the event loop it is created
+        # on, so it is built lazily on first use from inside that loop. It
+        # reuses the credentials above, so building it does no blocking I/O.
+        self._async_client: Optional[texttospeech.TextToSpeechAsyncClient] = None
+        self._async_client_failed = self._credentials is None
+        
+        # Caps in-flight synthesize_speech RPCs so a burst of NPC lines
+        # overlaps without blowing through the per-project TTS quota
+        self._sem = asyncio.Semaphore(settings.tts_concurrency or 3)
+        
+        # Background cache writes started by synthesize_bytes()
+        self._persist_tasks = set()
+    
+    async def aclose(self):
+        """Close the async client's gRPC channel if it was ever opened."""
+        if self._async_client is not None:
+            await self._async_client.transport.close()
+            self._async_client = None
+    
+    def _get_async_client(self) -> Optional[texttospeech.TextToSpeechAsyncClient]:
+        """Return the async client, creating it on first call (None if unavailable)."""
+        if self._async_client is None and not self._async_client_failed:
+            try:
+                channel = TextToSpeechGrpcAsyncIOTransport.create_channel(
+                    TTS_ENDPOINT, credentials=self._credentials, options=_CHANNEL_OPTIONS
+                )
+                self._async_client = texttospeech.TextToSpeechAsyncClient(
+                    transport=TextToSpeechGrpcAsyncIOTransport(channel=channel)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to initialize async TTS client: {e}")
+                self._async_client_failed = True
+        return self._async_client
+    
+    async def warm_up(self):
+        """
+        Connect both gRPC channels and prime the backend before real traffic.
+        
+        Sends a one-character synthesis so the first NPC line does not pay
+        for DNS, TLS and server-side cold start. Failures are only logged.
+        """
+        if self.client:
+            self.client.transport.grpc_channel.subscribe(
+                lambda state: None, try_to_connect=True
+            )
+        
+        client = self._get_async_client()
+        if not client:
+            return
+        
+        try:
+            await client.synthesize_speech(
+                input=texttospeech.SynthesisInput(text="."),
+                voice=texttospeech.VoiceSelectionParams(
+                    language_code="en-US",
+                    name="en-US-Neural2-C"
+                ),
+                audio_config=texttospeech.AudioConfig(
+                    audio_encoding=texttospeech.AudioEncoding.MP3
+                ),
+                timeout=10
+            )
+            logger.info("TTS channel warmed up")
+        except Exception as e:
+            logger.warning(f"TTS warm-up failed: {e}")
     
     def build_ssml(
         self,
@@ -46,77 +221,44 @@ class TTSClient:
         Returns:
             SSML-formatted string
         """
-        # Base prosody settings
-        rate = "100%"
-        pitch = "+0st"
-        volume = "medium"
-        
-        # Adjust based on emotion
-        if emotion == Emotion.ANGRY:
-            rate = "105%"
-            pitch = "+2st"
-            volume = "loud"
-        elif emotion == Emotion.HAPPY:
-            rate = "105%"
-            pitch = "+1st"
-        elif emotion == Emotion.SAD:
-            rate = "92%"
-            pitch = "-1st"
-            volume = "soft"
-        elif emotion == Emotion.FEAR:
-            rate = "110%"
-            pitch = "+3st"
-            volume = "soft"
-        elif emotion == Emotion.SURPRISED:
-            rate = "108%"
-            pitch = "+2st"
-        elif emotion == Emotion.DISGUST:
-            rate = "95%"
-            pitch = "-2st"
-        
-        # Style overrides
-        if style == SSMLStyle.WHISPERED:
-            rate = "95%"
-            volume = "x-soft"
-        elif style == SSMLStyle.SHOUTED:
-            rate = "110%"
-            pitch = "+3st"
-            volume = "x-loud"
-        elif style == SSMLStyle.URGENT:
-            rate = "115%"
-        elif style == SSMLStyle.CALM:
-            rate = "92%"
-            pitch = "-1st"
-        elif style == SSMLStyle.NARRATION:
-            rate = "98%"
-        
-        # Build SSML
-        ssml = f"""<speak>
-  <prosody rate="{rate}" pitch="{pitch}" volume="{volume}">
-    {text}
-  </prosody>
-</speak>"""
-        
-        return ssml
+        prosody = _COMBINED.get((emotion, style))
+        if prosody is None:
+            # Not an Emotion/SSMLStyle member; resolve it the slow way
+            prosody = _prosody_for(emotion, style)
+        return _SSML_TMPL.format(*prosody, text)
     
-    def synthesize(
+    def split_ssml(
         self,
-        ssml: str,
-        voice_name: str = "en-US-Neural2-C",
-        language_code: str = "en-US"
-    ) -> Optional[str]:
+        text: str,
+        emotion: Optional[Emotion] = None,
+        style: Optional[SSMLStyle] = None
+    ) -> List[str]:
         """
-        Synthesize SSML to audio file and return URL.
+        Split an utterance into sentences, each wrapped in its own SSML.
+        
+        Short clips synthesize faster, so the first sentence can start
+        playing while the rest are still being rendered.
         
         Args:
-            ssml: SSML-formatted text
-            voice_name: Google Cloud voice name (default: Neural2-C, feminine)
-            language_code: Language code (default: en-US)
+            text: The utterance text
+            emotion: Emotional state for prosody tuning
+            style: SSML style override
         
         Returns:
-            URL to the generated audio file, or None if synthesis failed
+            One SSML string per sentence, in order
         """
-        if not self.client:
+        sentences = [s for s in _SENTENCE_BOUNDARY.split(text.strip()) if s]
+        return [self.build_ssml(sentence, emotion, style) for sentence in sentences]
+    
+    async def _synthesize_audio(
+        self,
+        ssml: str,
+        voice_name: str,
+        language_code: str
+    ) -> Optional[bytes]:
+        """Run the synthesize_speech RPC and return the MP3 bytes (None on failure)."""
+        client = self._get_async_client()
+        if not client:
             logger.error("TTS client not initialized")
             return None
         
@@ -138,34 +280,238 @@ class TTSClient:
             )
             
             # Perform synthesis
-            response = self.client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
-            
-            # Generate unique filename
-            filename = f"{uuid.uuid4()}.mp3"
-            file_path = Path(settings.media_dir) / filename
-            
-            # Ensure media directory exists
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Write audio file
-            with open(file_path, "wb") as out:
-                out.write(response.audio_content)
-            
-            # Build URL
-            audio_url = f"{settings.media_base_url}/{filename}"
-            
-            logger.info(f"Synthesized audio: {filename} ({len(response.audio_content)} bytes)")
-            return audio_url
+            async with self._sem:
+                response = await client.synthesize_speech(
+                    input=synthesis_input,
+                    voice=voice,
+                    audio_config=audio_config
+                )
+            return response.audio_content
             
         except Exception as e:
             logger.error(f"TTS synthesis failed: {e}", exc_info=True)
             return None
     
-    def synthesize_with_emotion(
+    @staticmethod
+    async def _persist(audio: bytes, file_path: Path):
+        """Write a clip to its content-addressed path in the media directory."""
+        # Ensure media directory exists
+        await aiofiles.os.makedirs(file_path.parent, exist_ok=True)
+        
+        # Write to a temp file and rename so a concurrent request never
+        # sees (and caches) a half-written clip
+        tmp_path = file_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        async with aiofiles.open(tmp_path, "wb") as out:
+            await out.write(audio)
+        await aiofiles.os.replace(tmp_path, file_path)
+        logger.info("Synthesized audio: %s (%d bytes)", file_path.name, len(audio))
+    
+    async def _persist_in_background(self, audio: bytes, file_path: Path):
+        """_persist() for fire-and-forget use: failures are logged, not raised."""
+        try:
+            await self._persist(audio, file_path)
+        except Exception as e:
+            logger.warning(f"Failed to cache audio {file_path.name}: {e}")
+    
+    async def synthesize(
+        self,
+        ssml: str,
+        voice_name: str = "en-US-Neural2-C",
+        language_code: str = "en-US"
+    ) -> Optional[str]:
+        """
+        Synthesize SSML to audio file and return URL.
+        
+        Args:
+            ssml: SSML-formatted text
+            voice_name: Google Cloud voice name (default: Neural2-C, feminine)
+            language_code: Language code (default: en-US)
+        
+        Returns:
+            URL to the generated audio file, or None if synthesis failed
+        """
+        filename = f"{audio_cache_key(ssml, voice_name, language_code)}.mp3"
+        file_path = Path(settings.media_dir) / filename
+        audio_url = f"{settings.media_base_url}/{filename}"
+        
+        # Same input was synthesized before: reuse the file on disk
+        if await aiofiles.os.path.exists(file_path):
+            logger.debug("TTS cache hit: %s", filename)
+            return audio_url
+        
+        audio = await self._synthesize_audio(ssml, voice_name, language_code)
+        if audio is None:
+            return None
+        
+        try:
+            await self._persist(audio, file_path)
+        except Exception as e:
+            logger.error(f"Failed to write audio {filename}: {e}", exc_info=True)
+            return None
+        return audio_url
+    
+    async def synthesize_bytes(
+        self,
+        ssml: str,
+        voice_name: str = "en-US-Neural2-C",
+        language_code: str = "en-US"
+    ) -> Optional[bytes]:
+        """
+        Synthesize SSML and return the MP3 bytes directly.
+        
+        Skips the write-then-download round trip of synthesize(): the clip is
+        returned as soon as Google sends it and written to the media cache by
+        a background task, so later requests for the same line still hit disk.
+        
+        Args:
+            ssml: SSML-formatted text
+            voice_name: Google Cloud voice name (default: Neural2-C, feminine)
+            language_code: Language code (default: en-US)
+        
+        Returns:
+            MP3 bytes, or None if synthesis failed
+        """
+        filename = f"{audio_cache_key(ssml, voice_name, language_code)}.mp3"
+        file_path = Path(settings.media_dir) / filename
+        
+        if await aiofiles.os.path.exists(file_path):
+            logger.debug("TTS cache hit: %s", filename)
+            async with aiofiles.open(file_path, "rb") as cached:
+                return await cached.read()
+        
+        audio = await self._synthesize_audio(ssml, voice_name, language_code)
+        if audio is not None:
+            # Hold a reference until done; the loop only keeps weak ones
+            task = asyncio.create_task(self._persist_in_background(audio, file_path))
+            self._persist_tasks.add(task)
+            task.add_done_callback(self._persist_tasks.discard)
+        return audio
+    
+    async def synthesize_batch(
+        self,
+        items: List[Tuple[str, str]]
+    ) -> List[Optional[str]]:
+        """
+        Synthesize several clips concurrently, preserving input order.
+        
+        Args:
+            items: (ssml, voice_name) pairs, e.g. one per sentence of a line
+        
+        Returns:
+            Audio URLs in the same order as items (None where synthesis failed)
+        """
+        return await asyncio.gather(
+            *(self.synthesize(ssml, voice_name) for ssml, voice_name in items)
+        )
+    
+    def synthesize_stream(
+        self,
+        text: str,
+        voice_name: str = STREAMING_VOICE,
+        language_code: str = "en-US"
+    ) -> Iterator[bytes]:
+        """
+        Stream synthesized audio chunks as Google produces them.
+        
+        Unlike synthesize(), playback can start on the first chunk instead of
+        after the whole clip is rendered. Chunks are also written to a
+        content-addressed .pcm file so a repeated line is replayed from disk.
+        
+        Args:
+            text: Plain text utterance (streaming does not accept SSML)
+            voice_name: Streaming-capable voice (Journey / Chirp HD)
+            language_code: Language code (default: en-US)
+        
+        Yields:
+            Raw LINEAR16 audio chunks (see STREAMING_MEDIA_TYPE)
+        """
+        filename = f"{audio_cache_key(text, voice_name, language_code)}.pcm"
+        file_path = Path(settings.media_dir) / filename
+        
+        if file_path.exists():
+            logger.debug("TTS stream cache hit: %s", filename)
+            with open(file_path, "rb") as cached:
+                while chunk := cached.read(STREAMING_CHUNK_SIZE):
+                    yield chunk
+            return
+        
+        if not self.client:
+            logger.error("TTS client not initialized")
+            return
+        
+        requests = iter([
+            texttospeech.StreamingSynthesizeRequest(
+                streaming_config=texttospeech.StreamingSynthesizeConfig(
+                    voice=texttospeech.VoiceSelectionParams(
+                        language_code=language_code,
+                        name=voice_name
+                    )
+                )
+            ),
+            texttospeech.StreamingSynthesizeRequest(
+                input=texttospeech.StreamingSynthesisInput(text=text)
+            ),
+        ])
+        
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        total = 0
+        complete = False
+        try:
+            # BufferedWriter already passes writes larger than the buffer
+            # straight through after flushing, so big chunks are not copied
+            with open(tmp_path, "wb", buffering=STREAM_WRITE_BUFFER) as out:
+                for response in self.client.streaming_synthesize(requests):
+                    out.write(response.audio_content)
+                    total += len(response.audio_content)
+                    yield response.audio_content
+            complete = True
+        except Exception as e:
+            logger.error(f"TTS streaming synthesis failed: {e}", exc_info=True)
+        finally:
+            # Only keep the clip if the whole stream made it to disk; a client
+            # disconnect or RPC error leaves a truncated file behind otherwise
+            if complete and total:
+                tmp_path.replace(file_path)
+                logger.info("Streamed audio: %s (%d bytes)", filename, total)
+            else:
+                tmp_path.unlink(missing_ok=True)
+    
+    async def synthesize_sentences(
+        self,
+        text: str,
+        emotion: Optional[Emotion] = None,
+        style: Optional[SSMLStyle] = None,
+        voice_name: str = "en-US-Neural2-C"
+    ) -> AsyncIterator[Optional[str]]:
+        """
+        Synthesize an utterance sentence by sentence, yielding URLs in order.
+        
+        All sentences are submitted at once (bounded by the semaphore), and
+        each URL is yielded as soon as it and every earlier one are ready.
+        
+        Args:
+            text: Plain text utterance
+            emotion: Emotional state
+            style: SSML style
+            voice_name: Voice preset
+        
+        Yields:
+            Audio URL per sentence (None where synthesis failed)
+        """
+        tasks = [
+            asyncio.create_task(self.synthesize(ssml, voice_name))
+            for ssml in self.split_ssml(text, emotion, style)
+        ]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            # Consumer went away early: drop the sentences nobody will play
+            for task in tasks:
+                task.cancel()
+    
+    async def synthesize_with_emotion(
         self,
         text: str,
         emotion: Optional[Emotion] = None,
@@ -185,7 +531,7 @@ class TTSClient:
             URL to generated audio file
         """
         ssml = self.build_ssml(text, emotion, style)
-        return self.synthesize(ssml, voice_name)
+        return await self.synthesize(ssml, voice_name)
 
 
 # Predefined voice presets for common NPC archetypes
@@ -214,11 +560,41 @@ def get_voice_for_preset(preset: Optional[str]) -> str:
     return "en-US-Neural2-C"  # Default
 
 
-# Global TTS client instance
-tts_client = TTSClient()
+# Global TTS client instance, created on first use so importing this module
+# does not load Google credentials or open gRPC channels
+_tts_client: Optional[TTSClient] = None
+_tts_client_lock = asyncio.Lock()
+
+
+async def get_tts_client() -> TTSClient:
+    """Return the shared TTSClient, creating it on first call."""
+    global _tts_client
+    if _tts_client is None:
+        # Concurrent first callers wait here without blocking the loop while
+        # one of them builds the client (credential discovery) on a thread
+        async with _tts_client_lock:
+            if _tts_client is None:
+                _tts_client = await asyncio.to_thread(TTSClient)
+    return _tts_client
+
+
+async def warm_up_tts_client():
+    """Create the shared client, then warm its channels. Run at startup."""
+    client = await get_tts_client()
+    await client.warm_up()
+
+
+async def close_tts_client():
+    """Close the shared client's channels if it was ever created."""
+    if _tts_client is not None:
+        await _tts_client.aclose()
+
 
+# (ssml, voice_name) -> audio URL for recently synthesized lines
+_AUDIO_URL_CACHE: LRUCache = LRUCache(maxsize=1024)
 
-def synthesize_ssml(
+
+async def synthesize_ssml(
     ssml: str,
     voice_name: str = "en-US-Neural2-C"
 ) -> Optional[str]:
@@ -226,6 +602,9 @@ def synthesize_ssml(
     Convenience function for synthesizing SSML.
     This is what the FastAPI endpoint calls.
     
+    Recently requested (ssml, voice) pairs are answered from memory without
+    touching the filesystem or the TTS API.
+    
     Args:
         ssml: SSML-formatted text
         voice_name: Google Cloud voice name
@@ -233,10 +612,59 @@ def synthesize_ssml(
     Returns:
         URL to generated audio file
     """
-    return tts_client.synthesize(ssml, voice_name)
+    key = (ssml, voice_name)
+    audio_url = _AUDIO_URL_CACHE.get(key)
+    if audio_url is None:
+        client = await get_tts_client()
+        audio_url = await client.synthesize(ssml, voice_name)
+        # Failures are not cached so the next request retries
+        if audio_url is not None:
+            _AUDIO_URL_CACHE[key] = audio_url
+    return audio_url
 
 
-def synthesize_from_response(
+async def synthesize_ssml_bytes(
+    ssml: str,
+    voice_name: str = "en-US-Neural2-C"
+) -> Optional[bytes]:
+    """
+    Convenience function returning MP3 bytes instead of a URL.
+    Used by the FastAPI endpoint when the client accepts audio/mpeg.
+    
+    Args:
+        ssml: SSML-formatted text
+        voice_name: Google Cloud voice name
+    
+    Returns:
+        MP3 bytes, or None if synthesis failed
+    """
+    client = await get_tts_client()
+    return await client.synthesize_bytes(ssml, voice_name)
+
+
+async def stream_speech(
+    text: str,
+    voice_name: str = STREAMING_VOICE
+) -> Optional[Iterator[bytes]]:
+    """
+    Convenience function for streaming synthesis.
+    This is what the chunked FastAPI endpoint iterates.
+    
+    Args:
+        text: Plain text utterance
+        voice_name: Streaming-capable voice name
+    
+    Returns:
+        Iterator of raw audio chunks, or None if TTS is unavailable
+    """
+    client = await get_tts_client()
+    if not client.client:
+        logger.error("TTS client not initialized")
+        return None
+    return client.synthesize_stream(text, voice_name)
+
+
+async def synthesize_from_response(
     text: str,
     emotion: Optional[Emotion] = None,
     voice_preset: Optional[str] = None,
@@ -255,5 +683,29 @@ def synthesize_from_response(
         URL to generated audio file
     """
     voice_name = get_voice_for_preset(voice_preset)
-    return tts_client.synthesize_with_emotion(text, emotion, ssml_style, voice_name)
+    client = await get_tts_client()
+    return await client.synthesize_with_emotion(text, emotion, ssml_style, voice_name)
 
+
+async def synthesize_sentences_from_response(
+    text: str,
+    emotion: Optional[Emotion] = None,
+    voice_preset: Optional[str] = None,
+    ssml_style: Optional[SSMLStyle] = None
+) -> AsyncIterator[Optional[str]]:
+    """
+    Sentence-pipelined variant of synthesize_from_response.
+    
+    Args:
+        text: The utterance
+        emotion: NPC emotion
+        voice_preset: Voice preset name
+        ssml_style: SSML style
+    
+    Yields:
+        Audio URLs, one per sentence, in order
+    """
+    voice_name = get_voice_for_preset(voice_preset)
+    client = await get_tts_client()
+    async for audio_url in client.synthesize_sentences(text, emotion, ssml_style, voice_name):
+        yield audio_url
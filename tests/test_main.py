@@ -0,0 +1,98 @@
+"""
+Unit tests for the chat turn pipeline in the FastAPI app.
+Tests how a turn's memory_writes reach the memory database.
+"""
+import asyncio
+import json
+import time
+
+import pytest
+from cachetools import TTLCache
+
+from server import llm_client, main
+from server.llm_client import GeminiClient
+from server.memory import MemoryDAO
+from server.schemas import ChatTurnRequest
+
+
+RESPONSE = json.dumps({
+    "utterance": "Welcome back, traveler.",
+    "emotion": "happy",
+    "behavior_directive": "none",
+    "memory_writes": [{"salience": 0, "text": "Player said hello again"}]
+})
+
+PAYLOAD = ChatTurnRequest(
+    npc_id="elenor",
+    player_id="p1",
+    player_text="Hello!",
+    persona={
+        "name": "Elenor",
+        "role": "mage",
+        "values": ["knowledge"],
+        "quirks": ["hums"],
+        "backstory": ["Studied at the tower"]
+    },
+    context={"scene": "tower", "time_of_day": "dusk", "weather": "clear"}
+)
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeModels:
+    """Stands in for client.aio.models; streams RESPONSE in small pieces."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_stream(self, **kwargs):
+        self.calls += 1
+
+        async def stream():
+            for i in range(0, len(RESPONSE), 8):
+                yield _Chunk(RESPONSE[i:i + 8])
+
+        return stream()
+
+
+def _fake_gemini_client() -> GeminiClient:
+    """GeminiClient wired to _FakeModels instead of the SDK."""
+    client = GeminiClient.__new__(GeminiClient)
+    models = _FakeModels()
+    client.client = type("Client", (), {"aio": type("Aio", (), {"models": models})()})()
+    client.model = "fake"
+    return client
+
+
+@pytest.mark.asyncio
+async def test_cached_turn_does_not_rewrite_memory(monkeypatch):
+    """Test that replaying a cached response doesn't store its memory again."""
+    dao = MemoryDAO(":memory:")
+    dao.init_db()
+    # Three higher-salience memories keep the new row out of the top-3 in
+    # the prompt, so the second turn has the same prompt and hits the cache
+    for i in range(3):
+        dao.write(npc_id="elenor", player_id="p1", text=f"Important {i}", salience=3)
+
+    gemini = _fake_gemini_client()
+    queue = asyncio.Queue()
+    monkeypatch.setattr(main, "memory_dao", dao)
+    monkeypatch.setattr(llm_client, "_RESPONSE_CACHE", TTLCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(main.app.state, "gemini_client", gemini, raising=False)
+    monkeypatch.setattr(main.app.state, "memory_write_queue", queue, raising=False)
+
+    worker = asyncio.create_task(main.memory_writer_loop(queue))
+    try:
+        for _ in range(2):
+            chunks = [chunk async for chunk in main._run_turn(PAYLOAD, time.time())]
+            assert chunks[-1]["type"] == "final"
+            await queue.join()
+
+        assert gemini.client.aio.models.calls == 1
+        assert dao.count_memories(npc_id="elenor") == 4
+    finally:
+        worker.cancel()
+        dao.close()
@@ -5,10 +5,19 @@ Tests read/write operations and salience×recency retrieval.
 import pytest
 import tempfile
 import os
+import sqlite3
+import threading
+import time
 from pathlib import Path
 
-from server.memory import MemoryDAO
-from server.schemas import NpcMemoryWrite
+from server.memory import (
+    MemoryDAO,
+    SCHEMA_VERSION,
+    _TOP_SQL,
+    _TOP_MIN_SALIENCE_SQL,
+    _TOP_AFTER_SQL
+)
+from server.schemas import MemoryEntry, NpcMemoryWrite
 
 
 @pytest.fixture
@@ -17,15 +26,33 @@ def temp_db():
     fd, path = tempfile.mkstemp(suffix=".db")
     os.close(fd)
     yield path
-    # Cleanup
-    if os.path.exists(path):
-        os.remove(path)
+    # Cleanup (including WAL sidecar files)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
 
 
 @pytest.fixture
-def dao(temp_db):
-    """Create a MemoryDAO instance with temp database."""
-    return MemoryDAO(temp_db)
+def file_dao(temp_db):
+    """Create a MemoryDAO instance with temp database (for on-disk behavior)."""
+    dao = MemoryDAO(temp_db)
+    yield dao
+    dao.close()
+
+
+@pytest.fixture(scope="module")
+def shared_dao():
+    """One in-memory MemoryDAO per module, so the schema is built only once."""
+    dao = MemoryDAO(":memory:")
+    yield dao
+    dao.close()
+
+
+@pytest.fixture
+def dao(shared_dao):
+    """The shared in-memory MemoryDAO, emptied before each test."""
+    shared_dao.truncate()
+    return shared_dao
 
 
 def test_init_creates_tables(temp_db):
@@ -38,6 +65,130 @@ def test_init_creates_tables(temp_db):
     assert count == 0
 
 
+def test_schema_init_is_lazy_and_versioned(tmp_path):
+    """Test that the schema is created on first use and stamped with a version."""
+    db_path = str(tmp_path / "lazy.db")
+    dao = MemoryDAO(db_path)
+    assert not os.path.exists(db_path)
+    
+    dao.init_db()
+    with dao._get_connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    dao.close()
+    
+    # A second DAO on the same file finds the version and skips the DDL
+    again = MemoryDAO(db_path)
+    assert again.count_memories() == 0
+    again.close()
+
+
+def test_init_enables_wal(file_dao):
+    """Test that the database is switched to WAL journal mode."""
+    with file_dao._get_connection() as conn:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    assert mode == "wal"
+    assert synchronous == 1  # NORMAL
+
+
+def test_connection_reused_until_close(file_dao):
+    """Test that a thread keeps its connection and reconnects after close()."""
+    with file_dao._get_connection() as first:
+        pass
+    with file_dao._get_connection() as second:
+        pass
+    assert first is second
+    
+    file_dao.close()
+    with file_dao._get_connection() as third:
+        pass
+    assert third is not first
+    assert file_dao.count_memories() == 0
+
+
+@pytest.mark.parametrize("sql, params", [
+    (_TOP_SQL, ("elenor", "p1", 3)),
+    (_TOP_MIN_SALIENCE_SQL, ("elenor", "p1", 1, 3)),
+    (_TOP_AFTER_SQL, ("elenor", "p1", 0, 2, 100, 5, 3)),
+])
+def test_top_uses_covering_index(dao, sql, params):
+    """Test that top() queries are answered from the covering index without a sort."""
+    with dao._get_connection() as conn:
+        plan = " ".join(
+            row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)
+        )
+    assert "USING COVERING INDEX idx_mem_top_covering" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_keyset_pagination(dao):
+    """Test paging through top() and get_all_for_npc() with cursors."""
+    # Same timestamp and salience for several rows exercises the id tie-break
+    dao.write_many("elenor", "p1", [
+        {"text": f"Memory {i}", "salience": i % 2, "ts": 1000 + i // 3}
+        for i in range(7)
+    ])
+    
+    expected = [m.id for m in dao.top("elenor", "p1", k=10)]
+    paged, cursor = [], None
+    while True:
+        page = dao.top("elenor", "p1", k=2, cursor=cursor)
+        if not page:
+            break
+        paged.extend(m.id for m in page)
+        cursor = (page[-1].salience, page[-1].ts, page[-1].id)
+    assert paged == expected
+    
+    for player_id in ("p1", None):
+        expected = [m.id for m in dao.get_all_for_npc("elenor", player_id)]
+        paged, cursor = [], None
+        while True:
+            page = dao.get_all_for_npc("elenor", player_id, limit=3, cursor=cursor)
+            if not page:
+                break
+            paged.extend(m.id for m in page)
+            cursor = (page[-1].ts, page[-1].id)
+        assert paged == expected
+        assert len(paged) == 7
+
+
+def test_migrates_rowid_table(temp_db):
+    """Test that a database with the old AUTOINCREMENT table is migrated."""
+    conn = sqlite3.connect(temp_db)
+    conn.execute("""
+        CREATE TABLE npc_memory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            npc_id TEXT NOT NULL,
+            player_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            salience INTEGER NOT NULL,
+            private INTEGER NOT NULL DEFAULT 1,
+            keys TEXT,
+            ts INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_mem_query ON npc_memory(npc_id, player_id, salience DESC, ts DESC)")
+    conn.execute(
+        "INSERT INTO npc_memory (id, npc_id, player_id, text, salience, private, keys, ts) "
+        "VALUES (7, 'elenor', 'p1', 'Old memory', 2, 1, '[\"ring\", \"kindness\"]', 1000)"
+    )
+    conn.commit()
+    conn.close()
+    
+    dao = MemoryDAO(temp_db)
+    old = dao.top("elenor", "p1")
+    assert [(m.id, m.text) for m in old] == [(7, "Old memory")]
+    assert old[0].keys_list == ["ring", "kindness"]
+    assert dao.write("elenor", "p1", "New memory", 1) == 8
+    
+    with dao._get_connection() as conn:
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'npc_memory'"
+        ).fetchone()[0]
+    assert "WITHOUT ROWID" in sql
+    dao.close()
+
+
 def test_write_and_retrieve_single_memory(dao):
     """Test writing a single memory and retrieving it."""
     row_id = dao.write(
@@ -61,15 +212,21 @@ def test_write_and_retrieve_single_memory(dao):
     assert mem.text == "Player returned lost ring"
     assert mem.salience == 2
     assert mem.private is True
+    assert mem.keys_list == ["ring", "kindness"]
+    
+    # Reading keys_list stores nothing on the model, so equality is unchanged
+    assert mem == MemoryEntry.model_validate(mem.model_dump())
 
 
 def test_salience_ordering(dao):
     """Test that memories are retrieved by salience (higher first)."""
     # Write memories with different salience levels
-    dao.write("elenor", "p1", "Low importance", salience=0)
-    dao.write("elenor", "p1", "Medium importance", salience=1)
-    dao.write("elenor", "p1", "Critical event", salience=3)
-    dao.write("elenor", "p1", "High importance", salience=2)
+    dao.write_many("elenor", "p1", [
+        {"text": "Low importance", "salience": 0},
+        {"text": "Medium importance", "salience": 1},
+        {"text": "Critical event", "salience": 3},
+        {"text": "High importance", "salience": 2},
+    ])
     
     # Retrieve top 3
     memories = dao.top("elenor", "p1", k=3)
@@ -83,14 +240,12 @@ def test_salience_ordering(dao):
 
 def test_recency_ordering(dao):
     """Test that memories of equal salience are ordered by recency."""
-    import time
-    
     # Write multiple memories with same salience
-    dao.write("elenor", "p1", "First event", salience=1, ts=1000)
-    time.sleep(0.01)  # Ensure different timestamps
-    dao.write("elenor", "p1", "Second event", salience=1, ts=2000)
-    time.sleep(0.01)
-    dao.write("elenor", "p1", "Third event", salience=1, ts=3000)
+    dao.write_many("elenor", "p1", [
+        {"text": "First event", "salience": 1, "ts": 1000},
+        {"text": "Second event", "salience": 1, "ts": 2000},
+        {"text": "Third event", "salience": 1, "ts": 3000},
+    ])
     
     # Retrieve all
     memories = dao.top("elenor", "p1", k=10)
@@ -163,6 +318,93 @@ def test_write_from_model(dao):
     assert memories[0].text == "Model-based write"
 
 
+def test_write_many(dao):
+    """Test writing a turn's memory_writes list in one batch."""
+    written = dao.write_many("elenor", "p1", [
+        {"text": "Player bought a potion", "salience": 1, "keys": ["shop"]},
+        {"text": "Player insulted the guard", "salience": 3, "private": False},
+    ])
+    assert written == 2
+    
+    memories = dao.top("elenor", "p1", k=5)
+    assert [m.text for m in memories] == ["Player insulted the guard", "Player bought a potion"]
+    assert memories[0].private is False
+    assert memories[1].private is True
+    
+    assert dao.write_many("elenor", "p1", []) == 0
+    
+    with pytest.raises(ValueError):
+        dao.write_many("elenor", "p1", [{"text": "Bad", "salience": 9}])
+    assert dao.count_memories() == 2
+
+
+def test_write_many_from_models(dao):
+    """Test writing models for several NPCs/players in one batch."""
+    written = dao.write_many_from_models([
+        NpcMemoryWrite(npc_id="elenor", player_id="p1", text="Gave a gift", salience=2),
+        NpcMemoryWrite(npc_id="elenor", player_id="p2", text="Asked for directions", salience=0),
+        NpcMemoryWrite(npc_id="guard", player_id="p1", text="Caught sneaking", salience=3, keys=["crime"]),
+    ])
+    assert written == 3
+    
+    assert [m.text for m in dao.top("elenor", "p1")] == ["Gave a gift"]
+    assert [m.text for m in dao.top("elenor", "p2")] == ["Asked for directions"]
+    assert dao.top("guard", "p1")[0].keys == "crime"
+    
+    assert dao.write_many_from_models([]) == 0
+
+
+def test_top_cache_invalidation(dao):
+    """Test that cached top() results are dropped on writes and deletes."""
+    dao.write("elenor", "p1", "First", salience=1)
+    assert [m.text for m in dao.top("elenor", "p1")] == ["First"]
+    
+    # A row written behind the DAO's back is hidden by the cache...
+    with dao._get_connection() as conn:
+        conn.execute(
+            "INSERT INTO npc_memory (id, npc_id, player_id, text, salience, private, keys, ts) "
+            "VALUES (100, 'elenor', 'p1', 'Sneaky', 3, 1, NULL, 1)"
+        )
+    assert [m.text for m in dao.top("elenor", "p1")] == ["First"]
+    
+    # ...until a write through the DAO for the same pair invalidates it
+    dao.write("elenor", "p1", "Second", salience=0)
+    assert [m.text for m in dao.top("elenor", "p1")] == ["Sneaky", "First", "Second"]
+    
+    # Deletes invalidate every pair
+    assert dao.delete_old_memories(days_old=1) == 1
+    assert [m.text for m in dao.top("elenor", "p1")] == ["First", "Second"]
+
+
+def test_iter_for_npc(dao):
+    """Test that iter_for_npc() streams the same rows as get_all_for_npc()."""
+    for i in range(5):
+        dao.write("elenor", "p1" if i % 2 else "p2", f"Memory {i}", salience=1, ts=1000 + i)
+    
+    rows = dao.iter_for_npc("elenor")
+    first = next(rows)
+    assert first.text == "Memory 4"
+    assert [first.id] + [m.id for m in rows] == [m.id for m in dao.get_all_for_npc("elenor")]
+    
+    assert [m.text for m in dao.iter_for_npc("elenor", "p1", limit=1)] == ["Memory 3"]
+
+
+def test_delete_old_memories_reclaims_space(file_dao):
+    """Test that deleting old rows frees pages and truncates the WAL."""
+    file_dao.write_many("elenor", "p1", [
+        {"text": "x" * 150, "salience": 1, "ts": 1000} for _ in range(2000)
+    ])
+    file_dao.write("elenor", "p1", "Recent", salience=1)
+    
+    assert file_dao.delete_old_memories(days_old=1) == 2000
+    assert [m.text for m in file_dao.top("elenor", "p1")] == ["Recent"]
+    
+    with file_dao._get_connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert os.path.getsize(file_dao.db_path + "-wal") == 0
+
+
 def test_text_truncation(dao):
     """Test that long text is truncated to 160 chars."""
     long_text = "A" * 200
@@ -182,24 +424,65 @@ def test_salience_validation(dao):
         dao.write("elenor", "p1", "Negative salience", salience=-1)
 
 
+def test_truncate(dao):
+    """Test that truncate() empties the table and the caches but keeps the schema."""
+    dao.write("elenor", "p1", "Event", salience=1)
+    assert dao.count_memories() == 1
+    assert len(dao.top("elenor", "p1")) == 1
+    
+    dao.truncate()
+    assert dao.count_memories() == 0
+    assert dao.top("elenor", "p1") == []
+    assert dao.write("elenor", "p1", "Again", salience=1) == 1
+
+
 def test_count_memories(dao):
     """Test counting memories."""
     assert dao.count_memories() == 0
     
-    dao.write("elenor", "p1", "Event 1", salience=1)
-    dao.write("elenor", "p1", "Event 2", salience=1)
-    dao.write("garrick", "p1", "Event 3", salience=1)
+    dao.write_many_from_models([
+        NpcMemoryWrite(npc_id="elenor", player_id="p1", text="Event 1", salience=1),
+        NpcMemoryWrite(npc_id="elenor", player_id="p1", text="Event 2", salience=1),
+        NpcMemoryWrite(npc_id="garrick", player_id="p1", text="Event 3", salience=1),
+    ])
     
     assert dao.count_memories() == 3
     assert dao.count_memories(npc_id="elenor") == 2
     assert dao.count_memories(npc_id="garrick") == 1
 
 
+def test_count_cache_invalidation(dao):
+    """Test that cached counts are served until a write or delete changes them."""
+    dao.write("elenor", "p1", "Event 1", salience=1, ts=1000)
+    assert dao.count_memories() == 1
+    assert dao.count_memories(npc_id="elenor") == 1
+    
+    # A row written behind the DAO's back is hidden by the cache...
+    with dao._get_connection() as conn:
+        conn.execute(
+            "INSERT INTO npc_memory (id, npc_id, player_id, text, salience, private, keys, ts) "
+            "VALUES (100, 'elenor', 'p2', 'Sneaky', 1, 1, NULL, 1000)"
+        )
+    assert dao.count_memories() == 1
+    
+    # ...until the DAO's own writes and deletes invalidate it
+    dao.write_many("garrick", "p1", [{"text": "Event 2", "salience": 1}])
+    assert dao.count_memories() == 3
+    assert dao.count_memories(npc_id="elenor") == 1  # untouched NPC stays cached
+    assert dao.count_memories(npc_id="garrick") == 1
+    
+    assert dao.delete_old_memories(days_old=1) == 2
+    assert dao.count_memories() == 1
+    assert dao.count_memories(npc_id="elenor") == 0
+
+
 def test_get_all_for_npc(dao):
     """Test retrieving all memories for an NPC."""
-    dao.write("elenor", "p1", "Event 1", salience=1)
-    dao.write("elenor", "p1", "Event 2", salience=2)
-    dao.write("elenor", "p2", "Event 3", salience=1)
+    dao.write_many_from_models([
+        NpcMemoryWrite(npc_id="elenor", player_id="p1", text="Event 1", salience=1),
+        NpcMemoryWrite(npc_id="elenor", player_id="p1", text="Event 2", salience=2),
+        NpcMemoryWrite(npc_id="elenor", player_id="p2", text="Event 3", salience=1),
+    ])
     
     # Get all for NPC (all players)
     all_mems = dao.get_all_for_npc("elenor")
@@ -210,6 +493,46 @@ def test_get_all_for_npc(dao):
     assert len(p1_mems) == 2
 
 
+@pytest.mark.asyncio
+async def test_async_wrappers(dao):
+    """Test that the async wrappers read and write through the same database."""
+    row_id = await dao.write_async("elenor", "p1", "Async event", salience=2)
+    assert row_id > 0
+    
+    memories = await dao.top_async("elenor", "p1", k=5)
+    assert len(memories) == 1
+    assert memories[0].text == "Async event"
+    assert await dao.count_memories_async() == 1
+
+
+def test_in_memory_transactions_serialized(dao):
+    """Test that a rollback on one thread can't undo another's open transaction."""
+    started = threading.Event()
+    
+    def slow_write():
+        with dao._get_connection() as conn:
+            conn.execute(
+                "INSERT INTO npc_memory (id, npc_id, player_id, text, salience, private, keys, ts) "
+                "VALUES (1, 'elenor', 'p1', 'Slow write', 1, 1, NULL, 1000)"
+            )
+            started.set()
+            time.sleep(0.2)
+    
+    def failing_write():
+        started.wait()
+        with pytest.raises(RuntimeError):
+            with dao._get_connection():
+                raise RuntimeError("boom")
+    
+    threads = [threading.Thread(target=slow_write), threading.Thread(target=failing_write)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert [m.text for m in dao.get_all_for_npc("elenor")] == ["Slow write"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
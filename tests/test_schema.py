@@ -15,7 +15,9 @@ from server.schemas import (
     Persona,
     GameContext,
     ChatTurnRequest,
-    NPC_DIALOGUE_SCHEMA
+    NPC_DIALOGUE_ADAPTER,
+    NPC_DIALOGUE_SCHEMA,
+    SSMLStyle
 )
 
 
@@ -69,41 +71,23 @@ def test_valid_full_response():
     assert response.memory_writes[0].salience == 2
 
 
-def test_utterance_max_length():
-    """Test that utterances longer than 320 chars are rejected."""
-    data = {
-        "utterance": "A" * 321,  # Too long
-        "emotion": "neutral",
-        "behavior_directive": "none"
-    }
-    
-    with pytest.raises(ValidationError) as exc_info:
-        NpcDialogueResponse(**data)
-    
-    assert "utterance" in str(exc_info.value)
-
-
-def test_invalid_emotion():
-    """Test that invalid emotion values are rejected."""
-    data = {
-        "utterance": "Hello",
-        "emotion": "excited",  # Not in enum
-        "behavior_directive": "none"
-    }
-    
-    with pytest.raises(ValidationError):
-        NpcDialogueResponse(**data)
-
-
-def test_invalid_behavior_directive():
-    """Test that invalid behavior directives are rejected."""
-    data = {
-        "utterance": "Hello",
-        "emotion": "neutral",
-        "behavior_directive": "dance"  # Not in enum
-    }
-    
-    with pytest.raises(ValidationError):
+@pytest.mark.parametrize("field, value", [
+    ("utterance", "A" * 321),  # Longer than 320 chars
+    ("emotion", "excited"),  # Not in enum
+    ("behavior_directive", "dance"),  # Not in enum
+    ("memory_writes", [  # At most 2 memory writes
+        {"salience": 1, "text": "Event 1"},
+        {"salience": 1, "text": "Event 2"},
+        {"salience": 1, "text": "Event 3"}
+    ]),
+    ("style_tags", ["formal", "casual", "whisper", "shout"]),  # At most 3
+])
+def test_invalid_response_field(field, value):
+    """Test that out-of-range or unknown field values are rejected."""
+    data = {"utterance": "Hello", "emotion": "neutral", "behavior_directive": "none"}
+    data[field] = value
+    
+    with pytest.raises(ValidationError, match=field):
         NpcDialogueResponse(**data)
 
 
@@ -127,36 +111,6 @@ def test_memory_write_validation():
         MemoryWrite(salience=1, text="A" * 161)
 
 
-def test_memory_writes_max_items():
-    """Test that at most 2 memory writes are allowed."""
-    data = {
-        "utterance": "Hello",
-        "emotion": "neutral",
-        "behavior_directive": "none",
-        "memory_writes": [
-            {"salience": 1, "text": "Event 1"},
-            {"salience": 1, "text": "Event 2"},
-            {"salience": 1, "text": "Event 3"}  # Too many
-        ]
-    }
-    
-    with pytest.raises(ValidationError):
-        NpcDialogueResponse(**data)
-
-
-def test_style_tags_max_items():
-    """Test that at most 3 style tags are allowed."""
-    data = {
-        "utterance": "Hello",
-        "emotion": "neutral",
-        "behavior_directive": "none",
-        "style_tags": ["formal", "casual", "whisper", "shout"]  # Too many
-    }
-    
-    with pytest.raises(ValidationError):
-        NpcDialogueResponse(**data)
-
-
 def test_persona_validation():
     """Test persona model validation."""
     persona = Persona(
@@ -232,6 +186,16 @@ def test_schema_dict_structure():
     assert NPC_DIALOGUE_SCHEMA["additionalProperties"] is False
 
 
+def test_schema_enums_match_models():
+    """Test that the schema enum lists are generated from the Python enums."""
+    props = NPC_DIALOGUE_SCHEMA["properties"]
+    assert props["emotion"]["enum"] == [e.value for e in Emotion]
+    assert props["style_tags"]["items"]["enum"] == [t.value for t in StyleTag]
+    assert props["behavior_directive"]["enum"] == [b.value for b in BehaviorDirective]
+    assert props["voice_hint"]["properties"]["ssml_style"]["enum"] == [s.value for s in SSMLStyle]
+    assert "heal_player" in props["behavior_directive"]["enum"]
+
+
 def test_json_serialization():
     """Test that models can be serialized to JSON."""
     response = NpcDialogueResponse(
@@ -272,8 +236,7 @@ def test_sample_gemini_output():
     }
     """
     
-    data = json.loads(gemini_output)
-    response = NpcDialogueResponse(**data)
+    response = NPC_DIALOGUE_ADAPTER.validate_json(gemini_output)
     
     assert "kindness" in response.utterance
     assert response.emotion == Emotion.NEUTRAL